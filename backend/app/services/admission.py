@@ -0,0 +1,225 @@
+import asyncio
+import os
+import random
+import time
+from urllib.parse import urlparse
+
+# Errors that mean the site is blocking or throttling us, not that one video is bad
+BLOCKED_ERRORS = ("Could not find data blob", "Could not find Instagram counts", "timed out")
+
+
+class TokenBucket:
+    """Allows `rate` scrapes per second on average, with bursts up to `burst` (rate 0 = unlimited)."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, max_wait):
+        """
+        Take a token, waiting for one if needed.
+        Returns False (without taking one) if it wouldn't be available within `max_wait` seconds.
+        """
+        if self.rate <= 0:
+            return True
+        # Reserve up front: the count goes negative by the tokens promised to
+        # earlier waiters, so each caller's wait includes the queue ahead of it.
+        # No await before the reservation, so this needs no lock.
+        self._refill()
+        wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+        if wait > max_wait:
+            return False
+        self._tokens -= 1
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._tokens += 1  # Hand the reservation back to the callers behind us
+                raise
+        return True
+
+    @property
+    def tokens(self):
+        self._refill()
+        return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Trips open after `failure_threshold` consecutive blocked scrapes, then
+    rejects scrapes immediately until a cooldown passes. After the cooldown a
+    single trial scrape is let through (half-open): success closes the
+    breaker, failure re-opens it with the cooldown doubled (plus jitter), up
+    to `max_cooldown`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, max_cooldown=600.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.opened_until = 0.0
+        self.last_error = None
+        self._trial_in_flight = False
+
+    def allow(self):
+        """Whether a scrape may go ahead now."""
+        if self.state == self.OPEN and time.monotonic() >= self.opened_until:
+            self.state = self.HALF_OPEN
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            print(f"Scraper: Circuit closed after {self.trips} trip(s)")
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._trial_in_flight = False
+
+    def record_failure(self, error):
+        self.last_error = error
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._trip()
+
+    def release(self):
+        """End a half-open trial without a verdict (e.g. it never ran, or the video was bad)."""
+        self._trial_in_flight = False
+
+    def retry_after(self):
+        return max(0.0, self.opened_until - time.monotonic())
+
+    def _trip(self):
+        # Exponential backoff, jittered over the upper half of the window so hosts don't re-probe in lockstep
+        cooldown = min(self.max_cooldown, self.base_cooldown * (2 ** self.trips))
+        cooldown = random.uniform(cooldown / 2, cooldown)
+        self.trips += 1
+        self.state = self.OPEN
+        self.opened_until = time.monotonic() + cooldown
+        print(f"Scraper: Circuit open for {cooldown:.0f}s after {self.failures} blocked scrape(s): {self.last_error}")
+
+    def summary(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "retry_after_s": round(self.retry_after(), 1) if self.state == self.OPEN else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+def host_key(url):
+    """Group hosts by site, so www., m. and vm.tiktok.com share one limit."""
+    host = (urlparse(url).hostname or "").lower()
+    parts = host.split(".")
+    return ".".join(parts[-2:]) if len(parts) >= 2 else host
+
+
+def is_blocked_error(result):
+    error = (result or {}).get("error")
+    return bool(error) and any(marker in error for marker in BLOCKED_ERRORS)
+
+
+class ScrapeAdmission:
+    """
+    Per-host admission control in front of the scrapers: a token bucket caps
+    the scrape rate and a circuit breaker fails scrapes fast while a site is
+    blocking us, instead of letting each one wait out its navigation timeout.
+    """
+
+    def __init__(self, rate=2.0, burst=10, max_wait=30.0, failure_threshold=5, cooldown=30.0, max_cooldown=600.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._buckets = {}
+        self._breakers = {}
+        self.rate_limited = 0
+
+    def _bucket(self, host):
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    def breaker(self, host):
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(self.failure_threshold, self.cooldown, self.max_cooldown)
+        return self._breakers[host]
+
+    async def admit(self, url):
+        """Returns None if the scrape may go ahead, otherwise an error dict to return instead."""
+        host = host_key(url)
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            retry_after = breaker.retry_after()
+            return {
+                "error": f"Scraping {host} is paused after repeated blocked requests; retry in {retry_after:.0f}s",
+                "retry_after": round(retry_after, 1),
+            }
+        try:
+            admitted = await self._bucket(host).acquire(self.max_wait)
+        except BaseException:
+            # Cancelled while queueing for a token: a half-open trial never ran, don't hold its slot
+            breaker.release()
+            raise
+        if not admitted:
+            self.rate_limited += 1
+            breaker.release()
+            return {"error": f"Scraping {host} is rate limited; try again shortly", "retry_after": 1.0}
+        return None
+
+    def record(self, url, result):
+        breaker = self.breaker(host_key(url))
+        if result and "error" not in result:
+            breaker.record_success()
+        elif is_blocked_error(result):
+            breaker.record_failure(result["error"])
+        else:
+            # Not a sign of blocking (e.g. a deleted video)
+            breaker.release()
+
+    def summary(self):
+        return {
+            "rate_per_s": self.rate,
+            "burst": self.burst,
+            "rate_limited": self.rate_limited,
+            "hosts": {
+                host: {**breaker.summary(), "tokens": round(max(0.0, self._bucket(host).tokens), 1)}
+                for host, breaker in self._breakers.items()
+            },
+        }
+
+
+def admission_from_env():
+    return ScrapeAdmission(
+        rate=float(os.getenv("SCRAPER_RATE_PER_HOST", "2")),
+        burst=float(os.getenv("SCRAPER_BURST_PER_HOST", "10")),
+        max_wait=float(os.getenv("SCRAPER_RATE_MAX_WAIT", "30")),
+        failure_threshold=int(os.getenv("SCRAPER_BREAKER_THRESHOLD", "5")),
+        cooldown=float(os.getenv("SCRAPER_BREAKER_COOLDOWN", "30")),
+        max_cooldown=float(os.getenv("SCRAPER_BREAKER_MAX_COOLDOWN", "600")),
+    )
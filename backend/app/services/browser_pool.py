@@ -0,0 +1,338 @@
+import asyncio
+import itertools
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from playwright_stealth import stealth_async
+from app.services import process_stats
+from app.services.metrics import registry, scrape_phase_seconds, timed
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/131.0.0.0 Safari/537.36"
+)
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+# Unknown switch Chromium ignores; tags each pooled browser's main process so its pid can be found
+POOL_TAG_ARG = "--viral-market-pool-browser"
+
+browser_recycles = registry.counter(
+    "scraper_browser_recycles_total", "Pooled browsers replaced, by reason (pages, memory, crash).", ("reason",)
+)
+
+
+class PooledBrowser:
+    """One pooled Chromium: its context, main process and usage counters."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, browser, context, pid):
+        self.id = next(self._ids)
+        self.browser = browser
+        self.context = context
+        self.pid = pid
+        self.pages_served = 0
+        self.in_use = 0
+        self.rss_bytes = None
+        self.retiring = None  # recycle reason once scheduled for replacement
+        self.started_at = time.monotonic()
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "pid": self.pid,
+            "pages_served": self.pages_served,
+            "in_use": self.in_use,
+            "rss_mb": round(self.rss_bytes / 1_000_000, 1) if self.rss_bytes is not None else None,
+            "age_s": round(time.monotonic() - self.started_at),
+            "retiring": self.retiring,
+        }
+
+
+class BrowserPool:
+    """
+    Long-lived pool of warmed Chromium browsers.
+    Each browser keeps one context open for its lifetime; callers lease a
+    fresh (stealthed) page from it and the page is closed on release.
+
+    Browsers are recycled after `max_pages` leases, when their process tree
+    grows past `max_rss_mb` (checked every `health_interval` seconds), or
+    when they crash. A replacement is launched straight away and the old
+    browser stops getting new leases but is only closed once its in-flight
+    pages are released, so recycling never fails a running scrape; a scrape
+    whose browser crashes under it is retried once via `run`.
+    """
+
+    def __init__(self, size=2, pages_per_browser=2, headless=True, max_pages=0, max_rss_mb=0, health_interval=15.0):
+        self.size = max(1, size)
+        self.pages_per_browser = max(1, pages_per_browser)
+        self.headless = headless
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.health_interval = health_interval
+        self.recycles = {}
+        self._playwright = None
+        self._browsers = []
+        self._slots = None
+        self._loop = None
+        self._launch_lock = None
+        self._tasks = set()
+        self._supervisor = None
+        self._stopping = False
+
+    @property
+    def running(self):
+        return self._playwright is not None
+
+    @property
+    def capacity(self):
+        return self.size * self.pages_per_browser
+
+    async def start(self):
+        """Launch the browsers (one context each) and start the health supervisor."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Queue()
+        self._launch_lock = asyncio.Lock()
+        self._stopping = False
+        self._playwright = await async_playwright().start()
+        try:
+            for _ in range(self.size):
+                await self._launch()
+        except Exception:
+            await self.stop()
+            raise
+        if process_stats.supported():
+            self._supervisor = asyncio.ensure_future(self._supervise())
+        print(f"BrowserPool: Started {self.size} browser(s), {self.capacity} page slot(s)")
+
+    async def stop(self):
+        """Close every browser and the Playwright driver."""
+        self._stopping = True
+        if self._supervisor:
+            self._supervisor.cancel()
+            self._supervisor = None
+        for task in list(self._tasks):
+            task.cancel()
+        for entry in self._browsers:
+            try:
+                await entry.browser.close()
+            except Exception as e:
+                print(f"BrowserPool: Error closing browser: {e}")
+        self._browsers = []
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+            print("BrowserPool: Stopped")
+
+    @asynccontextmanager
+    async def lease(self):
+        """Lease a page from a pooled context. The page is closed on exit."""
+        async with self._lease() as (_, page):
+            yield page
+
+    async def run(self, fn, *args, retries=1):
+        """
+        Return `await fn(page, *args)` on a leased page. If the browser
+        crashes under it, the result (or error) is thrown away and `fn` runs
+        again on a fresh lease, up to `retries` times.
+        """
+        for attempt in range(retries + 1):
+            entry = None
+            try:
+                async with self._lease() as (entry, page):
+                    result = await fn(page, *args)
+            except Exception:
+                if attempt < retries and self._crashed(entry):
+                    print(f"BrowserPool: Browser {entry.id} crashed mid-scrape, retrying on a fresh lease")
+                    continue
+                raise
+            if attempt < retries and self._crashed(entry):
+                print(f"BrowserPool: Browser {entry.id} crashed mid-scrape, retrying on a fresh lease")
+                continue
+            return result
+
+    def _crashed(self, entry):
+        if entry is None:
+            return False
+        if entry.retiring == "crash":
+            return True
+        try:
+            connected = entry.browser.is_connected()
+        except Exception:
+            connected = False
+        if not connected:
+            # The "disconnected" event may not have been delivered yet
+            self.retire(entry, "crash")
+        return not connected
+
+    @asynccontextmanager
+    async def _lease(self):
+        if not self.running:
+            raise RuntimeError("Browser pool is not running")
+        with timed(scrape_phase_seconds, phase="lease_wait", site="pool"):
+            entry = await self._take_slot()
+        entry.in_use += 1
+        page = None
+        try:
+            with timed(scrape_phase_seconds, phase="page_setup", site="pool"):
+                page = await entry.context.new_page()
+                await stealth_async(page)
+            yield entry, page
+        finally:
+            if page:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            entry.in_use -= 1
+            entry.pages_served += 1
+            if self.max_pages and entry.pages_served >= self.max_pages:
+                self.retire(entry, "pages")
+            if entry.retiring:
+                self._close_if_drained(entry)
+            else:
+                self._slots.put_nowait(entry)
+
+    def retire(self, entry, reason):
+        """Stop leasing from `entry`, launch its replacement, and close it once drained."""
+        if entry.retiring or self._stopping:
+            return
+        entry.retiring = reason
+        self.recycles[reason] = self.recycles.get(reason, 0) + 1
+        browser_recycles.inc(reason=reason)
+        print(f"BrowserPool: Recycling browser {entry.id} ({reason}) after {entry.pages_served} page(s)")
+        self._spawn(self._launch_replacement())
+        self._close_if_drained(entry)
+
+    def summary(self):
+        return {
+            "running": self.running,
+            "capacity": self.capacity,
+            "max_pages": self.max_pages,
+            "max_rss_mb": self.max_rss_mb,
+            "recycles": dict(self.recycles),
+            "browsers": [entry.summary() for entry in self._browsers],
+        }
+
+    async def _take_slot(self):
+        while True:
+            entry = await self._slots.get()
+            # Slots of a retiring browser are dropped; its replacement brings new ones
+            if not entry.retiring:
+                return entry
+
+    async def _launch(self):
+        # Playwright doesn't expose the browser pid, so tag the launch with a
+        # unique switch and look the process up by its command line
+        tag = f"{POOL_TAG_ARG}={uuid.uuid4().hex}"
+        async with self._launch_lock:
+            before = await asyncio.to_thread(process_stats.descendants, os.getpid())
+            with timed(scrape_phase_seconds, phase="launch", site="pool"):
+                browser = await self._playwright.chromium.launch(
+                    headless=self.headless,
+                    args=LAUNCH_ARGS + [tag],
+                )
+                context = await browser.new_context(user_agent=USER_AGENT)
+            after = await asyncio.to_thread(process_stats.descendants, os.getpid())
+        pid = None
+        if process_stats.supported():
+            pid = await asyncio.to_thread(process_stats.find_by_arg, os.getpid(), tag)
+            if pid is None:
+                pid = process_stats.new_process_root(before, after)
+            if pid is None:
+                print("BrowserPool: Could not find a launched browser's pid; memory recycling is off for it")
+        entry = PooledBrowser(browser, context, pid)
+        browser.on("disconnected", lambda _: self._on_disconnected(entry))
+        self._browsers.append(entry)
+        for _ in range(self.pages_per_browser):
+            self._slots.put_nowait(entry)
+        return entry
+
+    async def _launch_replacement(self, attempts=5):
+        for attempt in range(attempts):
+            try:
+                await self._launch()
+                return
+            except Exception as e:
+                print(f"BrowserPool: Replacement launch failed ({e}), retrying")
+                await asyncio.sleep(2 ** attempt)
+        print("BrowserPool: Gave up replacing a browser; running with reduced capacity")
+
+    def _on_disconnected(self, entry):
+        if not self._stopping and not entry.retiring:
+            self.retire(entry, "crash")
+
+    def _close_if_drained(self, entry):
+        if entry.in_use == 0 and entry in self._browsers:
+            self._browsers.remove(entry)
+            self._spawn(self._close(entry))
+
+    async def _close(self, entry):
+        try:
+            await entry.browser.close()
+        except Exception:
+            pass  # Already gone if it crashed
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _supervise(self):
+        """Sample each browser's process-tree RSS and recycle those over the ceiling (if set)."""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for entry in list(self._browsers):
+                try:
+                    entry.rss_bytes = await asyncio.to_thread(process_stats.tree_rss_bytes, entry.pid)
+                    if self.max_rss_mb and entry.rss_bytes and entry.rss_bytes > self.max_rss_mb * 1_000_000:
+                        self.retire(entry, "memory")
+                except Exception as e:
+                    # Keep supervising the other browsers (and this one next round)
+                    print(f"BrowserPool: Health check failed for browser {entry.id}: {e}")
+
+    def run_sync(self, fn, *args, timeout=None):
+        """
+        Run `fn(page, *args)` on a leased page from a worker thread and return
+        its result. Must not be called from the pool's own event loop.
+        """
+        if not self.running:
+            raise RuntimeError("Browser pool is not running")
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+        if current_loop is self._loop:
+            raise RuntimeError("run_sync() called from the pool's event loop; await lease() instead")
+
+        future = asyncio.run_coroutine_threadsafe(self.run(fn, *args), self._loop)
+        return future.result(timeout)
+
+
+browser_pool = BrowserPool(
+    size=int(os.getenv("SCRAPER_POOL_SIZE", "2")),
+    pages_per_browser=int(os.getenv("SCRAPER_PAGES_PER_BROWSER", "8")),
+    headless=os.getenv("SCRAPER_HEADLESS", "1") != "0",
+    max_pages=int(os.getenv("SCRAPER_BROWSER_MAX_PAGES", "500")),
+    max_rss_mb=int(os.getenv("SCRAPER_BROWSER_MAX_RSS_MB", "1500")),
+    health_interval=float(os.getenv("SCRAPER_HEALTH_INTERVAL", "15")),
+)
+
+
+def _collect_browser_metrics():
+    browsers = browser_pool._browsers
+    return [
+        ("scraper_browser_rss_bytes", "gauge", "Resident memory of each pooled browser's process tree.",
+         [({"browser": str(b.id)}, b.rss_bytes) for b in browsers if b.rss_bytes is not None]),
+        ("scraper_browser_pages_served", "gauge", "Pages leased from each pooled browser since it launched.",
+         [({"browser": str(b.id)}, b.pages_served) for b in browsers]),
+        ("scraper_browser_pages_in_use", "gauge", "Pages currently leased from each pooled browser.",
+         [({"browser": str(b.id)}, b.in_use) for b in browsers]),
+    ]
+
+
+registry.register_collector(_collect_browser_metrics)
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import numpy as np
+from app.services import history_store
+from app.services.series_codec import epoch_seconds
+
+# Named chart ranges -> how far back they reach (None: everything)
+RANGES = {
+    "1d": timedelta(days=1),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+    "all": None,
+}
+DEFAULT_MAX_POINTS = 200
+MAX_POINTS_LIMIT = 5000
+
+
+def lttb(x, y, n):
+    """
+    Indices of the `n` points Largest-Triangle-Three-Buckets keeps from the
+    series (x, y), x ascending. First and last points are always kept; each
+    of the n - 2 buckets in between keeps the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    The per-bucket search is vectorized; only the bucket walk is a loop.
+    """
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n <= 2:
+        return np.array([0, size - 1][:max(n, 0)], dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n - 2 buckets over the interior points [1, size - 1)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # Each bucket's "next bucket" average; the last bucket's next is the final point
+    next_starts = np.append(edges[1:-1], size - 1)
+    next_ends = np.append(edges[2:], size)
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = next_ends - next_starts
+    avg_x = (cum_x[next_ends] - cum_x[next_starts]) / counts
+    avg_y = (cum_y[next_ends] - cum_y[next_starts]) / counts
+
+    keep = np.empty(n, dtype=np.int64)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        s, e = starts[i], ends[i]
+        # Twice the triangle area (a, candidate, next average); the constant factor doesn't matter
+        area = np.abs((x[a] - avg_x[i]) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (avg_y[i] - y[a]))
+        a = s + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(history, max_points):
+    """
+    Downsample one asset's {"view_history", "like_history"} to at most
+    `max_points` points. Views drive the point choice; likes keep the same
+    timestamps so both charts line up.
+    """
+    views = history["view_history"]
+    if len(views) <= max_points:
+        return history
+    x = epoch_seconds([p["timestamp"] for p in views])
+    y = np.fromiter((p["count"] for p in views), dtype=np.float64, count=len(views))
+    keep = lttb(x, y, max_points)
+    likes = history["like_history"]
+    return {
+        "view_history": [views[i] for i in keep],
+        "like_history": [likes[i] for i in keep] if len(likes) == len(views) else likes,
+    }
+
+
+class ChartHistoryCache:
+    """
+    Downsampled chart history per (asset, range, max_points), TTL + LRU like
+    ScrapeCache. Entries for an asset are dropped when it gets a new point.
+    Called from worker threads (asyncio.to_thread), hence the lock.
+    """
+
+    def __init__(self, ttl=60.0, max_entries=2048):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by invalidate(); a read that started before the bump isn't stored
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, asset_ids, range_key="all", max_points=DEFAULT_MAX_POINTS, start=None, end=None):
+        """
+        {asset_id: {"view_history": [...], "like_history": [...]}} downsampled
+        to `max_points`, over the named `range_key` or explicit ISO `start` /
+        `end`. Misses are read from the history store in one batch.
+        """
+        if start or end:
+            range_key = f"{start or ''}..{end or ''}"
+            since, until = start, end
+        else:
+            window = RANGES[range_key]
+            since = (datetime.utcnow() - window).isoformat() if window else None
+            until = None
+
+        now = time.monotonic()
+        out = {}
+        missing = []
+        generations = {}
+        with self._lock:
+            for aid in dict.fromkeys(asset_ids):
+                key = (aid, range_key, max_points)
+                entry = self._entries.get(key)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    out[aid] = entry[1]
+                else:
+                    self.misses += 1
+                    missing.append(aid)
+                    generations[aid] = self._generations.get(aid, 0)
+
+        if missing:
+            histories = history_store.read_history(missing, since, until)
+            fresh = {aid: downsample(histories[aid], max_points) for aid in missing}
+            with self._lock:
+                for aid, series in fresh.items():
+                    if self._generations.get(aid, 0) != generations[aid]:
+                        continue
+                    self._entries[(aid, range_key, max_points)] = (now + self.ttl, series)
+                    self._entries.move_to_end((aid, range_key, max_points))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            out.update(fresh)
+        return out
+
+    def get(self, asset_id, range_key="all", max_points=DEFAULT_MAX_POINTS, start=None, end=None):
+        return self.get_many([asset_id], range_key, max_points, start, end)[asset_id]
+
+    def invalidate(self, asset_id):
+        with self._lock:
+            self._generations[asset_id] = self._generations.get(asset_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == asset_id]:
+                del self._entries[key]
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "ttl_seconds": self.ttl,
+        }
+
+
+chart_history = ChartHistoryCache(
+    ttl=float(os.getenv("CHART_CACHE_TTL", "60")),
+    max_entries=int(os.getenv("CHART_CACHE_SIZE", "2048")),
+)
@@ -0,0 +1,215 @@
+import abc
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from app.services.http_extractor import HttpExtractor
+from app.services.scraper import scrape_tiktok_page, scrape_insta_page
+
+try:
+    import yt_dlp
+except ImportError:  # optional: pip install yt-dlp
+    yt_dlp = None
+
+# Hedge after this long when an extractor has too few samples for a p95
+DEFAULT_HEDGE_DELAY = 3.0
+MIN_HEDGE_SAMPLES = 20
+
+
+class Extractor(abc.ABC):
+    """
+    One way of getting a video's stats. `extract(url)` returns the
+    standard stats dict, None when this extractor found nothing, or an error dict.
+    """
+
+    name = None
+
+    @property
+    def available(self):
+        return True
+
+    @abc.abstractmethod
+    async def extract(self, url):
+        ...
+
+    async def close(self):
+        pass
+
+
+class HttpTier(Extractor):
+    """Browserless fetch of the server-rendered HTML (see http_extractor.py)."""
+
+    name = "http"
+
+    def __init__(self, engine):
+        self.http = HttpExtractor()
+
+    async def extract(self, url):
+        return await self.http.fetch(url)
+
+    async def close(self):
+        await self.http.close()
+
+
+class YtDlpTier(Extractor):
+    """
+    yt-dlp's TikTok extractor (as tried in check_ytdlp.py). It makes its own
+    requests with no browser; runs in threads since yt-dlp is synchronous.
+    A thread can't be cancelled when a hedge race is lost, so the threads
+    come from a small dedicated pool (YTDLP_THREADS) and every request has
+    a socket timeout, bounding how long a lost race keeps one busy.
+    """
+
+    name = "ytdlp"
+    OPTIONS = {"quiet": True, "no_warnings": True, "skip_download": True, "extract_flat": True}
+
+    def __init__(self, engine):
+        self.options = dict(self.OPTIONS, socket_timeout=max(1.0, min(engine.timeout, 15.0)))
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(os.getenv("YTDLP_THREADS", "4"))), thread_name_prefix="ytdlp"
+        )
+
+    @property
+    def available(self):
+        return yt_dlp is not None
+
+    async def extract(self, url):
+        try:
+            # Cancelling the await drops the call if it hasn't started in the pool yet
+            info = await asyncio.get_running_loop().run_in_executor(self._executor, self._extract_info, url)
+        except Exception as e:
+            print(f"Scraper: yt-dlp failed for {url}: {e}")
+            return None
+        if not info or info.get("view_count") is None:
+            return None
+        result = {
+            "views": info.get("view_count") or 0,
+            "likes": info.get("like_count") or 0,
+            "author": info.get("uploader") or "unknown",
+            "thumbnail": info.get("thumbnail") or "",
+        }
+        if info.get("id"):
+            result["video_id"] = str(info["id"])
+        print(f"Scraper: Extracted from yt-dlp - Views: {result['views']}, Likes: {result['likes']}, Author: {result['author']}")
+        return result
+
+    def _extract_info(self, url):
+        with yt_dlp.YoutubeDL(self.options) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    async def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PlaywrightTier(Extractor):
+    """A leased browser page running scrape_tiktok_page (most robust, most expensive)."""
+
+    name = "playwright"
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def extract(self, url):
+        return await self.engine._scrape_page(scrape_tiktok_page, url, "tiktok")
+
+
+class InstagramPageTier(Extractor):
+    """A leased browser page running scrape_insta_page."""
+
+    name = "instagram_page"
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def extract(self, url):
+        return await self.engine._scrape_page(scrape_insta_page, url, "instagram")
+
+
+# name -> factory(engine); register more with register_extractor()
+EXTRACTORS = {
+    "http": HttpTier,
+    "ytdlp": YtDlpTier,
+    "playwright": PlaywrightTier,
+    "instagram_page": InstagramPageTier,
+}
+
+
+def register_extractor(name, factory):
+    EXTRACTORS[name] = factory
+
+
+def build_extractors(engine, names, warn_unavailable=True):
+    """
+    Instantiate the named extractors (cheapest first), skipping unknown or
+    unavailable ones. Only the default chain passes warn_unavailable=False:
+    optional extractors there are dropped quietly when their package is missing.
+    """
+    extractors = []
+    for name in names:
+        factory = EXTRACTORS.get(name)
+        if factory is None:
+            print(f"Scraper: Unknown extractor {name!r}, skipping")
+            continue
+        extractor = factory(engine)
+        if not extractor.available:
+            if not warn_unavailable:
+                continue
+            print(f"Scraper: Extractor {name!r} is not available (missing dependency?), skipping")
+            continue
+        extractors.append(extractor)
+    return extractors
+
+
+def is_valid(result):
+    return bool(result) and "error" not in result
+
+
+async def run_hedged(extractors, run, hedge_delay):
+    """
+    Hedged execution: start the first (cheapest) extractor, and start the next
+    one as soon as the current one fails or hasn't answered within
+    `hedge_delay(extractor)` seconds (None: never hedge, only fall back on
+    failure). Slower extractors keep running, and the first valid result
+    wins; the rest are cancelled.
+
+    `run(extractor)` is awaited for each attempt. Returns the winning result,
+    or the last failure if none succeeded.
+    """
+    if not extractors:
+        return None
+    loop = asyncio.get_running_loop()
+    remaining = list(extractors)
+    running = {}
+    last_result = None
+
+    def _launch():
+        extractor = remaining.pop(0)
+        task = asyncio.ensure_future(run(extractor))
+        running[task] = extractor
+        delay = hedge_delay(extractor)
+        return extractor, None if delay is None else loop.time() + delay
+
+    try:
+        newest, hedge_at = _launch()
+        while running:
+            timeout = max(0.0, hedge_at - loop.time()) if remaining and hedge_at is not None else None
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                print(f"Scraper: {newest.name} has not answered in time, hedging with {remaining[0].name}")
+                newest, hedge_at = _launch()
+                continue
+            for task in done:
+                extractor = running.pop(task)
+                if task.exception() is not None:
+                    print(f"Scraper: {extractor.name} extractor raised: {task.exception()}")
+                    continue
+                result = task.result()
+                if is_valid(result):
+                    return result
+                last_result = result or last_result
+            # The newest attempt failed outright: don't wait out its hedge delay
+            if remaining and newest not in running.values():
+                newest, hedge_at = _launch()
+        return last_result
+    finally:
+        for task in running:
+            task.cancel()
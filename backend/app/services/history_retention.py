@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from app.services.supabase_client import supabase
+
+
+class HistoryCompactor:
+    """
+    Background retention for video_history: periodically calls the
+    compact_video_history() SQL function, which rolls raw points older than
+    `raw_days` into hourly min/max/last buckets and hourly buckets older than
+    `hourly_days` into daily ones. Each call moves at most `batch_size` rows
+    per tier in one statement, so refresh writes never wait on it; a pass keeps
+    calling until a batch comes back short.
+    """
+
+    def __init__(self, raw_days=7.0, hourly_days=90.0, interval=3600.0, batch_size=50000):
+        self.raw_days = raw_days
+        self.hourly_days = max(raw_days, hourly_days)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.raw_rolled = 0
+        self.hourly_rolled = 0
+        self.passes = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.ensure_future(self._run())
+            print(f"HistoryCompactor: Started, raw {self.raw_days:g}d, hourly {self.hourly_days:g}d, then daily")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _compact_batch(self):
+        res = supabase.rpc("compact_video_history", {
+            "raw_window": f"{self.raw_days * 86400:.0f} seconds",
+            "hourly_window": f"{self.hourly_days * 86400:.0f} seconds",
+            "batch_size": self.batch_size,
+        }).execute()
+        row = (res.data or [{}])[0]
+        return row.get("raw_rolled") or 0, row.get("hourly_rolled") or 0
+
+    async def run_once(self):
+        """One compaction pass; returns (raw rows, hourly rows) rolled up."""
+        started = time.time()
+        raw_total = hourly_total = 0
+        while True:
+            raw, hourly = await asyncio.to_thread(self._compact_batch)
+            raw_total += raw
+            hourly_total += hourly
+            if raw < self.batch_size and hourly < self.batch_size:
+                break
+        self.raw_rolled += raw_total
+        self.hourly_rolled += hourly_total
+        self.passes += 1
+        self.last_run = started
+        self.last_duration = time.time() - started
+        if raw_total or hourly_total:
+            print(f"HistoryCompactor: Rolled up {raw_total} raw point(s) and {hourly_total} hourly bucket(s) "
+                  f"in {self.last_duration:.1f}s")
+        return raw_total, hourly_total
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"HistoryCompactor: Compaction failed ({e}); run migrations/video_history_retention.sql")
+            await asyncio.sleep(self.interval)
+
+    def summary(self):
+        return {
+            "running": self.running,
+            "raw_days": self.raw_days,
+            "hourly_days": self.hourly_days,
+            "passes": self.passes,
+            "raw_rolled": self.raw_rolled,
+            "hourly_rolled": self.hourly_rolled,
+            "last_run_s_ago": round(time.time() - self.last_run) if self.last_run else None,
+            "last_duration_s": round(self.last_duration, 2) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+history_compactor = HistoryCompactor(
+    raw_days=float(os.getenv("HISTORY_RAW_DAYS", "7")),
+    hourly_days=float(os.getenv("HISTORY_HOURLY_DAYS", "90")),
+    interval=float(os.getenv("HISTORY_COMPACT_INTERVAL", "3600")),
+    batch_size=int(os.getenv("HISTORY_COMPACT_BATCH", "50000")),
+)
@@ -0,0 +1,100 @@
+from datetime import datetime
+from app.services.supabase_client import supabase
+
+# Append-only view / like time series, one row per scrape (migrations/create_video_history.sql)
+TABLE = "video_history"
+# Older points rolled up to min/max/last per bucket (migrations/video_history_retention.sql),
+# newest tier first
+ROLLUP_TABLES = (("hour", "video_history_hourly"), ("day", "video_history_daily"))
+ROLLUP_COLUMNS = "asset_id, last_at, views_min, views_max, views_last, likes_min, likes_max, likes_last"
+# Supabase returns at most this many rows per request
+PAGE_SIZE = 1000
+# Keep .in_() filters (sent as URL query params) a reasonable length
+ID_CHUNK = 200
+
+
+def append_point(asset_id, views, likes, timestamp=None):
+    """Record one scrape of `asset_id`. Returns the ISO timestamp written."""
+    timestamp = timestamp or datetime.utcnow().isoformat()
+    supabase.table(TABLE).insert({
+        "asset_id": asset_id,
+        "timestamp": timestamp,
+        "views": int(views),
+        "likes": int(likes),
+    }).execute()
+    return timestamp
+
+
+_rollups_available = True
+
+
+def _select_range(table, columns, time_column, asset_ids, since, until):
+    rows = []
+    for i in range(0, len(asset_ids), ID_CHUNK):
+        start = 0
+        while True:
+            query = supabase.table(table).select(columns).in_("asset_id", asset_ids[i:i + ID_CHUNK])
+            if since:
+                query = query.gt(time_column, since)
+            if until:
+                query = query.lte(time_column, until)
+            page = query.order("asset_id").order(time_column).range(start, start + PAGE_SIZE - 1).execute().data
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                break
+            start += PAGE_SIZE
+    return rows
+
+
+def read_points(asset_ids, since=None, until=None):
+    """
+    History for `asset_ids` with since < timestamp <= until (either bound
+    optional, ISO strings), oldest first: [{"asset_id", "timestamp",
+    "views", "likes", "resolution"}, ...]. Raw points have resolution "raw".
+    Hourly / daily rollups ("hour" / "day") are reported at their last point,
+    with its views / likes plus the bucket's "views_min" / "views_max" /
+    "likes_min" / "likes_max".
+    """
+    global _rollups_available
+    asset_ids = list(dict.fromkeys(asset_ids))
+    # Raw first: a point compacted between reads then shows up twice (deduped below), never zero times
+    rows = [
+        dict(row, resolution="raw")
+        for row in _select_range(TABLE, "asset_id, timestamp, views, likes", "timestamp", asset_ids, since, until)
+    ]
+    if _rollups_available:
+        for resolution, table in ROLLUP_TABLES:
+            try:
+                buckets = _select_range(table, ROLLUP_COLUMNS, "last_at", asset_ids, since, until)
+            except Exception as e:
+                print(f"HistoryStore: Reading raw points only ({e}); run migrations/video_history_retention.sql")
+                _rollups_available = False
+                break
+            rows.extend(
+                {"asset_id": b["asset_id"], "timestamp": b["last_at"], "views": b["views_last"],
+                 "likes": b["likes_last"], "views_min": b["views_min"], "views_max": b["views_max"],
+                 "likes_min": b["likes_min"], "likes_max": b["likes_max"], "resolution": resolution}
+                for b in buckets
+            )
+    seen = set()
+    points = []
+    for row in sorted(rows, key=lambda r: (r["asset_id"], r["timestamp"])):
+        key = (row["asset_id"], row["timestamp"])
+        if key not in seen:
+            seen.add(key)
+            points.append(row)
+    return points
+
+
+def read_history(asset_ids, since=None, until=None):
+    """
+    {asset_id: {"view_history": [...], "like_history": [...]}} in the
+    [{"count", "timestamp"}] shape charts use. Assets without points get
+    empty lists.
+    """
+    history = {aid: {"view_history": [], "like_history": []} for aid in asset_ids}
+    for row in read_points(asset_ids, since, until):
+        series = history.setdefault(row["asset_id"], {"view_history": [], "like_history": []})
+        series["view_history"].append({"count": row["views"], "timestamp": row["timestamp"]})
+        series["like_history"].append({"count": row["likes"], "timestamp": row["timestamp"]})
+    return history
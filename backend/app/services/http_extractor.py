@@ -0,0 +1,90 @@
+import re
+import httpx
+from app.services.browser_pool import USER_AGENT
+from app.services.request_policy import traffic_stats
+from app.services.metrics import scrape_phase_seconds, scrape_strategy_seconds, timed
+from app.services.scraper import parse_hydration_json, HYDRATION_SCRIPT_IDS
+
+_SCRIPT_OPEN_RE = re.compile(
+    r'<script[^>]*\bid="(?P<id>' + "|".join(HYDRATION_SCRIPT_IDS) + r')"[^>]*>'
+)
+
+HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def extract_from_html(html):
+    """
+    Extract video stats from raw server-rendered HTML (no browser).
+    Uses the same hydration JSON paths as the Playwright scraper, so saved
+    pages such as dump_html.py's debug_page.html can be parsed offline.
+    """
+    scripts = {}
+    for match in _SCRIPT_OPEN_RE.finditer(html):
+        # str.find is far cheaper than a lazy regex over a multi-hundred-KB body
+        end = html.find("</script>", match.end())
+        if end >= 0:
+            scripts[match.group("id")] = html[match.end():end]
+    for script_id in HYDRATION_SCRIPT_IDS:
+        json_text = scripts.get(script_id)
+        if not json_text:
+            continue
+        try:
+            result = parse_hydration_json(json_text)
+            if result:
+                return result
+        except Exception as e:
+            print(f"Scraper: HTML extraction from {script_id} failed: {e}")
+    return None
+
+
+class HttpExtractor:
+    """
+    Browserless fast path: fetch the raw HTML over a pooled keep-alive
+    HTTP/2 client and parse the hydration blob out of it.
+    """
+
+    def __init__(self, timeout=10.0, max_connections=20):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                headers=HEADERS,
+                follow_redirects=True,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def fetch(self, url):
+        """Return the stats dict, or None if the page has no usable blob."""
+        try:
+            with timed(scrape_phase_seconds, phase="http_fetch", site="tiktok") as span:
+                response = await self._get_client().get(url)
+                span.succeed_if(response.status_code == 200)
+            traffic_stats.record("http", response.num_bytes_downloaded)
+            if response.status_code != 200:
+                print(f"Scraper: HTTP fast path got status {response.status_code} for {url}")
+                return None
+            with timed(scrape_strategy_seconds, strategy="html_json", site="tiktok") as span:
+                result = extract_from_html(response.text)
+                span.succeed_if(result)
+            return result
+        except Exception as e:
+            print(f"Scraper: HTTP fast path failed for {url}: {e}")
+            return None
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,151 @@
+import json
+import re
+import time
+from functools import lru_cache
+from app.services.strategy_stats import strategy_stats
+
+# Where TikTok keeps the video in each hydration blob layout
+ITEM_STRUCT_PATH = ("__DEFAULT_SCOPE__", "webapp.video-detail", "itemInfo", "itemStruct")
+# Leading keys of ITEM_STRUCT_PATH that are unique in the document (safe to find by plain search);
+# the rest are looked up as direct members of the webapp.video-detail object
+ITEM_STRUCT_ANCHOR = 2
+ITEM_MODULE_KEY = "ItemModule"
+
+# The only fields _format_video_data reads from an itemStruct
+VIDEO_FIELD_PATHS = {
+    "id": ("id",),
+    "stats": ("stats",),
+    "author": ("author",),
+    "cover": ("video", "cover"),
+}
+
+_decoder = json.JSONDecoder()
+_STRING_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+_FIRST_MEMBER_RE = re.compile(r'\{\s*"(?:[^"\\]|\\.)*"\s*:\s*')
+
+
+@lru_cache(maxsize=64)
+def _member_re(key):
+    return re.compile(r'"' + re.escape(key) + r'"\s*:\s*')
+
+
+def _depth(text, start, end):
+    """Object/array nesting depth at `end`, relative to `start`, ignoring strings."""
+    segment = _STRING_RE.sub("", text[start:end])
+    return (segment.count("{") + segment.count("[")) - (segment.count("}") + segment.count("]"))
+
+
+def member_start(text, obj_start, key):
+    """
+    Return the index where `key`'s value begins in the JSON object whose '{'
+    is at `obj_start`, or -1 if the object has no such direct member.
+    Nested objects that happen to use the same key are skipped.
+    """
+    pattern = _member_re(key)
+    pos = obj_start
+    while True:
+        match = pattern.search(text, pos)
+        if not match:
+            return -1
+        depth = _depth(text, obj_start, match.start())
+        if depth == 1:
+            return match.end()
+        if depth <= 0:
+            # Walked past the end of the object
+            return -1
+        pos = match.end()
+
+
+def anchor_value_start(text, path):
+    """
+    Follow a path of keys that each occur once in the document (scope and
+    container names such as "webapp.video-detail") by plain sequential search.
+    Much cheaper than member_start() on the large blob, which is mostly
+    unrelated scopes; returns the value index or -1.
+    """
+    pos = 0
+    for key in path:
+        match = _member_re(key).search(text, pos)
+        if not match:
+            return -1
+        pos = match.end()
+    return pos
+
+
+def find_value_start(text, path, obj_start):
+    """Follow a key path of direct members from the object at `obj_start`; returns the value index or -1."""
+    pos = obj_start
+    for key in path:
+        if pos < 0 or pos >= len(text) or text[pos] != "{":
+            return -1
+        pos = member_start(text, pos, key)
+    return pos
+
+
+def decode_at(text, index):
+    """Decode just the JSON value starting at `index`."""
+    value, _ = _decoder.raw_decode(text, index)
+    return value
+
+
+def _video_detail_start(text):
+    # "itemInfo" isn't unique: error / blocked pages put one in other scopes, so
+    # only the scope keys are searched for; inside video-detail it must be a direct member
+    detail_start = anchor_value_start(text, ITEM_STRUCT_PATH[:ITEM_STRUCT_ANCHOR])
+    if detail_start < 0:
+        return -1
+    return find_value_start(text, ITEM_STRUCT_PATH[ITEM_STRUCT_ANCHOR:], detail_start)
+
+
+def _item_module_start(text):
+    # SIGI_STATE layout: ItemModule -> {<video_id>: {...}}; take the first video
+    module_start = anchor_value_start(text, (ITEM_MODULE_KEY,))
+    if module_start < 0:
+        return -1
+    match = _FIRST_MEMBER_RE.match(text, module_start)
+    return match.end() if match else -1
+
+
+# Known itemStruct locations, in default order; tried cheapest-first (see strategy_stats.py)
+ITEM_LOCATORS = {
+    "video-detail": _video_detail_start,
+    "ItemModule": _item_module_start,
+}
+
+
+def item_struct_start(text):
+    """Index of the video's itemStruct object in any known blob layout, or -1."""
+    for name in strategy_stats.order("hydration_path", list(ITEM_LOCATORS)):
+        start_time = time.perf_counter()
+        start = ITEM_LOCATORS[name](text)
+        strategy_stats.record("hydration_path", name, time.perf_counter() - start_time, start >= 0)
+        if start >= 0:
+            return start
+    return -1
+
+
+def extract_video_fields(text):
+    """
+    Pull only id, stats, author and video.cover out of a raw hydration blob,
+    without json.loads-ing the (often multi-megabyte) whole document.
+    Returns a minimal itemStruct-shaped dict, or None if no video is found.
+    """
+    start = item_struct_start(text)
+    if start < 0 or text[start] != "{":
+        return None
+
+    # Generic keys like "stats" recur in nested objects, so check the depth here
+    fields = {}
+    for name, path in VIDEO_FIELD_PATHS.items():
+        value_start = find_value_start(text, path, start)
+        if value_start >= 0:
+            fields[name] = decode_at(text, value_start)
+
+    if "stats" not in fields:
+        return None
+    return {
+        "id": fields.get("id"),
+        "stats": fields["stats"],
+        "author": fields.get("author", {}),
+        "video": {"cover": fields.get("cover", "")},
+    }
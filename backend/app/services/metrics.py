@@ -0,0 +1,176 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; scrape phases range from sub-millisecond parsing to 30s+ navigations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    labels = _format_labels(self.labelnames, key, {"le": f"{bound:g}"})
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key, {"le": "+Inf"})
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds the app's metrics. Besides histograms and counters, collectors can
+    be registered to export values other modules already track (e.g. cache
+    counters) at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """
+        `collect()` returns a list of (name, type, help, samples) where samples
+        is a list of (labels dict, value).
+        """
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"Metrics: collector failed: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    names = tuple(labels.keys())
+                    lines.append(f"{name}{_format_labels(names, tuple(labels.values()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+scrape_phase_seconds = registry.histogram(
+    "scraper_phase_seconds",
+    "Time spent in each scrape phase (launch, lease_wait, page_setup, goto, hydration, http_fetch).",
+    ("phase", "site", "outcome"),
+)
+scrape_strategy_seconds = registry.histogram(
+    "scraper_strategy_seconds",
+    "Time spent in each extraction strategy / tier, by whether it produced data.",
+    ("strategy", "site", "outcome"),
+)
+
+
+class Span:
+    """A timed phase; outcome is success unless marked failed or it raises."""
+
+    def __init__(self):
+        self.ok = True
+
+    def fail(self):
+        self.ok = False
+
+    def succeed_if(self, condition):
+        self.ok = bool(condition)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """
+    Time the enclosed block into `histogram` with an `outcome` label:
+        with timed(scrape_phase_seconds, phase="goto", site="tiktok") as span:
+            ...
+            span.succeed_if(result)
+    """
+    span = Span()
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        span.fail()
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, outcome="success" if span.ok else "failure", **labels)
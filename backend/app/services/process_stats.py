@@ -0,0 +1,133 @@
+import os
+
+try:
+    import psutil
+except ImportError:  # optional: falls back to /proc on Linux
+    psutil = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def supported():
+    """Whether process trees / RSS can be read on this host."""
+    return psutil is not None or os.path.isdir("/proc")
+
+
+def _parent_map():
+    """pid -> parent pid for every process, read from /proc."""
+    parents = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name can contain spaces / parens, so split after the last ')'
+        parents[int(name)] = int(stat.rsplit(")", 1)[1].split()[1])
+    return parents
+
+
+def descendants(pid):
+    """Pids of every process below `pid` (not including it)."""
+    if psutil is not None:
+        try:
+            return {child.pid for child in psutil.Process(pid).children(recursive=True)}
+        except psutil.Error:
+            return set()
+    if not os.path.isdir("/proc"):
+        return set()
+    children = {}
+    for child, parent in _parent_map().items():
+        children.setdefault(parent, []).append(child)
+    found = set()
+    stack = [pid]
+    while stack:
+        for child in children.get(stack.pop(), ()):
+            if child not in found:
+                found.add(child)
+                stack.append(child)
+    return found
+
+
+def _cmdline(pid):
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).cmdline()
+        except psutil.Error:
+            return []
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().decode(errors="replace").split("\0")
+    except OSError:
+        return []
+
+
+def find_by_arg(root, arg):
+    """
+    Pid of the process below `root` launched with command-line argument
+    `arg` (the topmost one, if its children inherited it), or None.
+    """
+    matches = {pid for pid in descendants(root) if arg in _cmdline(pid)}
+    if not matches:
+        return None
+    if psutil is not None:
+        parents = {}
+        for pid in matches:
+            try:
+                parents[pid] = psutil.Process(pid).ppid()
+            except psutil.Error:
+                pass
+    else:
+        parents = _parent_map()
+    roots = [pid for pid in matches if parents.get(pid) not in matches]
+    return roots[0] if len(roots) == 1 else None
+
+
+def new_process_root(before, after):
+    """
+    Given our descendant pids before and after launching a browser, return
+    the new browser's main pid: the one new process whose parent isn't new.
+    """
+    new = after - before
+    if not new:
+        return None
+    if psutil is not None:
+        parents = {}
+        for pid in new:
+            try:
+                parents[pid] = psutil.Process(pid).ppid()
+            except psutil.Error:
+                pass
+    else:
+        parents = _parent_map()
+    roots = [pid for pid in new if parents.get(pid) not in new]
+    return roots[0] if len(roots) == 1 else None
+
+
+def tree_rss_bytes(pid):
+    """Resident memory of `pid` plus all its descendants (renderers, GPU process...), or None."""
+    if pid is None:
+        return None
+    total = 0
+    found = False
+    for each in {pid} | descendants(pid):
+        rss = _rss_bytes(each)
+        if rss is not None:
+            total += rss
+            found = True
+    return total if found else None
+
+
+def _rss_bytes(pid):
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
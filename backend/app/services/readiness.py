@@ -0,0 +1,46 @@
+import os
+import time
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from app.services.stats import RollingStats
+from app.services.metrics import scrape_phase_seconds
+
+# Hard upper bound on how long we wait for a page to hydrate
+READY_TIMEOUT_MS = int(os.getenv("SCRAPER_READY_TIMEOUT_MS", "5000"))
+
+# Any of these means the data we extract is already in the DOM
+TIKTOK_READY_SELECTOR = ", ".join([
+    'script[id="__UNIVERSAL_DATA_FOR_REHYDRATION__"]',
+    'script[id="SIGI_STATE"]',
+    '[data-e2e="like-count"]',
+    '[data-e2e="video-play-count"]',
+    '[data-e2e="browse-video-count"]',
+])
+INSTA_READY_SELECTOR = "span:has-text('views')"
+
+
+# Per-site readiness durations; a failure means we hit the upper bound
+readiness_stats = RollingStats()
+
+
+async def wait_until_ready(page, selector=TIKTOK_READY_SELECTOR, label="tiktok", timeout_ms=READY_TIMEOUT_MS):
+    """
+    Wait until `selector` is attached to the page, up to `timeout_ms`.
+    Returns True if the page became ready, False if we hit the bound (the
+    caller still tries to extract whatever is there).
+    """
+    start = time.perf_counter()
+    try:
+        await page.wait_for_selector(selector, state="attached", timeout=timeout_ms)
+        ready = True
+    except PlaywrightTimeoutError:
+        ready = False
+    _record(label, start, ready)
+    return ready
+
+
+def _record(label, start, ready):
+    elapsed = time.perf_counter() - start
+    readiness_stats.record(label, elapsed, ready)
+    scrape_phase_seconds.observe(elapsed, phase="hydration", site=label, outcome="success" if ready else "failure")
+    status = "ready" if ready else "not ready (timed out)"
+    print(f"Scraper: {label} page {status} after {elapsed * 1000:.0f}ms")
@@ -0,0 +1,169 @@
+import asyncio
+import time
+import uuid
+from app.services.video_identity import platform_of
+from app.services.video_refresh import refresh_iter, select_all
+
+# Assets handed to refresh_iter at a time, so row loads and in-flight scrapes stay bounded
+CHUNK_SIZE = 500
+# Finished jobs kept around for status / result reads
+KEEP_FINISHED = 20
+
+
+class RefreshJob:
+    """One bulk refresh: its asset list, per-asset results so far and counters."""
+
+    def __init__(self, asset_ids, filters=None):
+        self.job_id = uuid.uuid4().hex
+        self.asset_ids = asset_ids
+        self.filters = filters or {}
+        self.status = "running"
+        self.results = []
+        self.updated = 0
+        self.failed = 0
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.task = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self):
+        return self.status != "running"
+
+    async def add(self, result):
+        self.results.append(result)
+        if result["success"]:
+            self.updated += 1
+        else:
+            self.failed += 1
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def stream(self, offset=0):
+        """Yield results from `offset` on as they arrive, until the job finishes."""
+        i = max(0, offset)
+        while True:
+            while i < len(self.results):
+                yield self.results[i]
+                i += 1
+            if self.finished:
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.results) > i or self.finished)
+
+    def summary(self, errors=True):
+        done = len(self.results)
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = len(self.asset_ids) - done
+        out = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "filters": self.filters,
+            "total": len(self.asset_ids),
+            "done": done,
+            "updated": self.updated,
+            "failed": self.failed,
+            "progress": round(done / len(self.asset_ids), 4) if self.asset_ids else 1.0,
+            "elapsed_s": round(elapsed, 1),
+            "assets_per_second": round(rate, 2),
+            "eta_s": round(remaining / rate, 1) if rate > 0 and not self.finished else None,
+            "error": self.error,
+        }
+        if errors:
+            out["errors"] = [r for r in self.results if not r["success"]]
+        return out
+
+
+class RefreshJobManager:
+    """
+    Runs bulk price refreshes in the background. `start` resolves the asset
+    set and returns a job immediately; callers poll `get(job_id).summary()`
+    or follow `stream()` for per-asset results. Jobs live in this process's
+    memory only.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, keep_finished=KEEP_FINISHED):
+        self.chunk_size = chunk_size
+        self.keep_finished = keep_finished
+        self.jobs = {}
+
+    async def start(self, asset_ids=None, held_only=False, platform=None):
+        filters = {"asset_ids": len(asset_ids) if asset_ids is not None else None,
+                   "held_only": held_only, "platform": platform}
+        ids = await asyncio.to_thread(self._resolve, asset_ids, held_only, platform)
+        job = RefreshJob(ids, filters)
+        self.jobs[job.job_id] = job
+        self._prune()
+        job.task = asyncio.ensure_future(self._run(job))
+        print(f"RefreshJobs: Started {job.job_id} over {len(ids)} asset(s)")
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job and not job.finished and job.task:
+            job.task.cancel()
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+        return job
+
+    async def stop(self):
+        for job_id in list(self.jobs):
+            await self.cancel(job_id)
+
+    def _resolve(self, asset_ids, held_only, platform):
+        """The asset IDs a job covers: explicit ones as given, else every video, narrowed by the filters."""
+        if asset_ids is not None and not held_only and not platform:
+            return list(dict.fromkeys(asset_ids))
+        videos = select_all("videos", "asset_id, video_url")
+        if asset_ids is not None:
+            wanted = set(asset_ids)
+            videos = [v for v in videos if v["asset_id"] in wanted]
+        if held_only:
+            held = {inv["asset_id"] for inv in select_all("investments", "asset_id")}
+            videos = [v for v in videos if v["asset_id"] in held]
+        if platform:
+            videos = [v for v in videos if platform_of(v["video_url"]) == platform]
+        return [v["asset_id"] for v in videos]
+
+    async def _run(self, job):
+        try:
+            for i in range(0, len(job.asset_ids), self.chunk_size):
+                async for result in refresh_iter(job.asset_ids[i:i + self.chunk_size]):
+                    await job.add(result)
+        except asyncio.CancelledError:
+            await job.finish("cancelled")
+            raise
+        except Exception as e:
+            print(f"RefreshJobs: Job {job.job_id} failed: {e}")
+            await job.finish("failed", str(e))
+        else:
+            await job.finish("done")
+            print(f"RefreshJobs: Finished {job.job_id}: {job.updated} updated, {job.failed} failed")
+
+    def _prune(self):
+        finished = sorted((j for j in self.jobs.values() if j.finished), key=lambda j: j.finished_at)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.job_id]
+
+    def summary(self):
+        return {
+            "running": sum(1 for j in self.jobs.values() if not j.finished),
+            "jobs": [j.summary(errors=False) for j in self.jobs.values()],
+        }
+
+
+refresh_jobs = RefreshJobManager()
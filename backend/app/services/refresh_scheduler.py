@@ -0,0 +1,297 @@
+import asyncio
+import heapq
+import math
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from app.services import history_store
+from app.services.video_refresh import refresh_iter, select_all, scrape_listeners
+
+# Recent history points kept per video for velocity estimates
+MOTION_POINTS = 8
+# How far back history is read for videos the scheduler hasn't seen yet
+MOTION_WINDOW = timedelta(days=7)
+
+
+def _epoch(timestamp):
+    """Epoch seconds from a Supabase timestamp string (naive ones are UTC), or None."""
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def estimate_motion(points):
+    """
+    View velocity (views/s) and acceleration (views/s^2) at the newest of
+    `points` [(epoch, views), ...] oldest first, from the slopes of the last
+    two segments. (0.0, 0.0) with fewer than two usable points.
+    """
+    points = [p for i, p in enumerate(points) if i == 0 or p[0] > points[i - 1][0]]
+    if len(points) < 2:
+        return 0.0, 0.0
+    (t1, v1), (t2, v2) = points[-2], points[-1]
+    velocity = (v2 - v1) / (t2 - t1)
+    if len(points) < 3:
+        return velocity, 0.0
+    t0, v0 = points[-3]
+    previous = (v1 - v0) / (t1 - t0)
+    # Slopes are measured at segment midpoints
+    acceleration = (velocity - previous) / ((t2 - t0) / 2)
+    return velocity, acceleration
+
+
+def time_to_change(target, velocity, acceleration):
+    """Seconds until views are expected to move by `target`, or None if never."""
+    if abs(acceleration) < 1e-12:
+        return target / velocity if velocity > 0 else None
+    # 0.5*a*t^2 + v*t - target = 0
+    discriminant = velocity * velocity + 2 * acceleration * target
+    if discriminant < 0:
+        return None  # Decelerating to a stop before it gets there
+    t = (-velocity + math.sqrt(discriminant)) / acceleration
+    return t if t > 0 else None
+
+
+class RefreshCandidate:
+    """A videos row as the scheduler sees it."""
+
+    def __init__(self, asset_id, video_url, last_scraped=None):
+        self.asset_id = asset_id
+        self.video_url = video_url
+        self.last_scraped = last_scraped
+        self.last_attempt = None
+        self.holders = 0
+        self.cost_basis = 0.0
+        self.points = deque(maxlen=MOTION_POINTS)
+        self.interval = None
+
+    @property
+    def weight(self):
+        """How much a stale price here matters: more holders and more coins at stake weigh more."""
+        return 1.0 + self.holders + math.log10(1.0 + self.cost_basis)
+
+    def add_point(self, timestamp, views):
+        if timestamp is not None and (not self.points or timestamp > self.points[-1][0]):
+            self.points.append((timestamp, views))
+
+    def due_at(self, min_interval):
+        """Next refresh: `interval` after the last scrape, but no retry sooner than `min_interval`."""
+        due = (self.last_scraped or 0.0) + (self.interval or min_interval)
+        if self.last_attempt:
+            due = max(due, self.last_attempt + min_interval)
+        return due
+
+
+class RefreshScheduler:
+    """
+    Background refresher for video prices. Keeps every videos row in a
+    priority queue ordered by weight x staleness, where the weight grows with
+    the number of investments holding the video and their total cost_basis,
+    and refreshes the top of the queue within a global budget of
+    `budget_per_minute` scrapes.
+
+    Each video's refresh interval adapts to how fast it is moving: view
+    velocity and acceleration are estimated from its recent history points, and
+    the interval is the time until views are expected to change by
+    `target_change` (a fraction of current views), clamped to
+    [min_interval, max_interval]. Fast movers get fresh prices; flat videos
+    stop using scrape budget. Staleness is measured in those intervals.
+    """
+
+    def __init__(self, budget_per_minute=30, tick=10.0, reload_interval=120.0, min_interval=300.0,
+                 max_interval=86400.0, target_change=0.01, min_target_views=100):
+        self.budget_per_minute = budget_per_minute
+        self.tick = tick
+        self.reload_interval = reload_interval
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.target_change = target_change
+        self.min_target_views = min_target_views
+        self.candidates = {}
+        self.refreshed = 0
+        self.failed = 0
+        self.last_error = None
+        self._budget = 0.0
+        self._last_tick = None
+        self._last_reload = 0.0
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.ensure_future(self._run())
+            print(f"RefreshScheduler: Started, budget {self.budget_per_minute} scrape(s)/min")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def observe(self, asset_id, views, likes, timestamp):
+        """
+        Scrape listener: every saved scrape of a known video (ours, /api/scrape,
+        /api/videos/refresh, bulk jobs) becomes a velocity sample.
+        """
+        candidate = self.candidates.get(asset_id)
+        if not candidate:
+            return  # Picked up with its history on the next reload
+        scraped = _epoch(timestamp)
+        candidate.last_scraped = max(candidate.last_scraped or 0.0, scraped or 0.0) or None
+        candidate.add_point(scraped, views)
+        candidate.interval = self.next_interval(candidate)
+
+    def next_interval(self, candidate):
+        """Seconds between refreshes for `candidate`, from its view velocity / acceleration."""
+        if len(candidate.points) < 2:
+            return self.min_interval
+        velocity, acceleration = estimate_motion(list(candidate.points))
+        views = candidate.points[-1][1]
+        target = max(self.min_target_views, views * self.target_change)
+        seconds = time_to_change(target, velocity, acceleration)
+        if seconds is None:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+    def priority(self, candidate, now):
+        """weight x how many refresh intervals the price is overdue by (never scraped: very)."""
+        if candidate.last_scraped is None:
+            return candidate.weight * 1000
+        interval = candidate.interval or self.min_interval
+        return candidate.weight * (now - candidate.last_scraped) / interval
+
+    def next_batch(self, limit, now=None):
+        """The `limit` due candidates with the highest priority."""
+        if limit <= 0:
+            return []
+        now = now or time.time()
+        due = (c for c in self.candidates.values() if c.due_at(self.min_interval) <= now)
+        return heapq.nlargest(limit, due, key=lambda c: self.priority(c, now))
+
+    def load(self, videos, investments, histories=None):
+        """
+        Rebuild the candidate set from videos and investments rows, keeping
+        local refresh times and motion points. `histories` maps asset_id to
+        recent history rows (oldest first) for videos not seen before.
+        """
+        histories = histories or {}
+        candidates = {}
+        for row in videos:
+            previous = self.candidates.get(row["asset_id"])
+            last_scraped = _epoch(row.get("last_scraped_at")) or _epoch(row.get("created_at"))
+            candidate = RefreshCandidate(row["asset_id"], row["video_url"], last_scraped)
+            if previous:
+                candidate.last_scraped = max(candidate.last_scraped or 0.0, previous.last_scraped or 0.0) or None
+                candidate.last_attempt = previous.last_attempt
+                candidate.points = previous.points
+            else:
+                for point in histories.get(row["asset_id"], [])[-MOTION_POINTS:]:
+                    candidate.add_point(_epoch(point["timestamp"]), point["views"])
+            candidate.interval = self.next_interval(candidate)
+            candidates[row["asset_id"]] = candidate
+        for inv in investments:
+            candidate = candidates.get(inv.get("asset_id"))
+            if candidate:
+                candidate.holders += 1
+                candidate.cost_basis += float(inv.get("cost_basis") or 0.0)
+        self.candidates = candidates
+
+    def _fetch(self, known_ids):
+        try:
+            videos = select_all("videos", "asset_id, video_url, created_at, last_scraped_at")
+        except Exception as e:
+            print(f"RefreshScheduler: Could not read last_scraped_at ({e}); run migrations/add_last_scraped_at.sql")
+            videos = select_all("videos", "asset_id, video_url, created_at")
+        investments = select_all("investments", "asset_id, cost_basis")
+        # History is only read once per video; later points come from our own refreshes
+        new_ids = [v["asset_id"] for v in videos if v["asset_id"] not in known_ids]
+        histories = {}
+        if new_ids:
+            since = (datetime.utcnow() - MOTION_WINDOW).isoformat()
+            for point in history_store.read_points(new_ids, since=since):
+                histories.setdefault(point["asset_id"], []).append(point)
+        return videos, investments, histories
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"RefreshScheduler: Tick failed: {e}")
+            await asyncio.sleep(self.tick)
+
+    async def run_once(self):
+        now = time.time()
+        if now - self._last_reload >= self.reload_interval:
+            self.load(*await asyncio.to_thread(self._fetch, set(self.candidates)))
+            self._last_reload = now
+
+        # Token bucket: budget accrues continuously and fractions carry over
+        # between ticks, capped at one minute's worth but never below one
+        # scrape, so budgets under 1/min still refresh every few minutes
+        elapsed = now - self._last_tick if self._last_tick else self.tick
+        self._last_tick = now
+        cap = max(1.0, self.budget_per_minute)
+        self._budget = min(cap, self._budget + self.budget_per_minute * elapsed / 60)
+
+        batch = self.next_batch(int(self._budget), now)
+        if not batch:
+            return
+        self._budget -= len(batch)
+        for candidate in batch:
+            candidate.last_attempt = now
+
+        async for result in refresh_iter([c.asset_id for c in batch]):
+            if result["success"]:
+                # Sample and last_scraped were recorded by observe()
+                self.refreshed += 1
+            else:
+                self.failed += 1
+                self.last_error = result.get("error")
+        print(f"RefreshScheduler: Refreshed {len(batch)} video(s) ({self.refreshed} ok / {self.failed} failed so far)")
+
+    def summary(self, top=5):
+        now = time.time()
+        return {
+            "running": self.running,
+            "budget_per_minute": self.budget_per_minute,
+            "min_interval_s": self.min_interval,
+            "max_interval_s": self.max_interval,
+            "candidates": len(self.candidates),
+            "due": sum(1 for c in self.candidates.values() if c.due_at(self.min_interval) <= now),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "last_error": self.last_error,
+            "next": [
+                {"asset_id": c.asset_id, "holders": c.holders, "cost_basis": round(c.cost_basis, 2),
+                 "stale_s": round(now - c.last_scraped) if c.last_scraped else None,
+                 "interval_s": round(c.interval or self.min_interval),
+                 "views_per_hour": round(estimate_motion(list(c.points))[0] * 3600),
+                 "priority": round(self.priority(c, now), 1)}
+                for c in self.next_batch(top, now)
+            ],
+        }
+
+
+refresh_scheduler = RefreshScheduler(
+    budget_per_minute=float(os.getenv("REFRESH_BUDGET_PER_MIN", "30")),
+    tick=float(os.getenv("REFRESH_TICK", "10")),
+    min_interval=float(os.getenv("REFRESH_MIN_INTERVAL", "300")),
+    max_interval=float(os.getenv("REFRESH_MAX_INTERVAL", "86400")),
+    target_change=float(os.getenv("REFRESH_TARGET_CHANGE", "0.01")),
+)
+scrape_listeners.append(refresh_scheduler.observe)
@@ -0,0 +1,169 @@
+import asyncio
+import os
+from collections import deque
+from urllib.parse import urlparse
+from app.services.metrics import registry
+
+# Resource types none of our extractors read
+DEFAULT_BLOCKED_TYPES = "media,image,font"
+
+# Analytics / telemetry hosts (matched as a suffix of the request host)
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "analytics.tiktok.com",
+    "mon.tiktokv.com",
+    "mcs.tiktokw.us",
+    "log.tiktokv.com",
+    "byteoversea.com",
+    "sentry.io",
+)
+
+
+class RequestPolicy:
+    """
+    Which requests a scraper page is allowed to make.
+    Anything whose resource type is blocked, or whose host is a known tracker,
+    is aborted unless the extractor explicitly allowlists it.
+    """
+
+    def __init__(self, blocked_types=(), blocked_hosts=(), allow_types=(), allow_hosts=()):
+        self.blocked_types = set(blocked_types) - set(allow_types)
+        self.blocked_hosts = tuple(h for h in blocked_hosts if h not in allow_hosts)
+        self.allow_hosts = tuple(allow_hosts)
+
+    def should_block(self, resource_type, url):
+        host = urlparse(url).hostname or ""
+        if any(_host_matches(host, allowed) for allowed in self.allow_hosts):
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        return any(_host_matches(host, blocked) for blocked in self.blocked_hosts)
+
+
+def _host_matches(host, domain):
+    return host == domain or host.endswith("." + domain)
+
+
+def _env_list(name, default=""):
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+def _build_policies():
+    if os.getenv("SCRAPER_BLOCKING", "1") == "0":
+        return {}
+    blocked_types = _env_list("SCRAPER_BLOCK_RESOURCES", DEFAULT_BLOCKED_TYPES)
+    # Hydration JSON and data-e2e count text need neither media nor images;
+    # SCRAPER_ALLOW_TYPES_<SITE> / SCRAPER_ALLOW_HOSTS_<SITE> let one extractor through anyway
+    return {
+        site: RequestPolicy(
+            blocked_types,
+            TRACKER_HOSTS,
+            allow_types=_env_list(f"SCRAPER_ALLOW_TYPES_{site.upper()}"),
+            allow_hosts=_env_list(f"SCRAPER_ALLOW_HOSTS_{site.upper()}"),
+        )
+        for site in ("tiktok", "instagram")
+    }
+
+
+# Per-extractor policies; extractors missing here are not intercepted
+POLICIES = _build_policies()
+
+
+class TrafficStats:
+    """Rolling bytes-transferred and blocked-request counts per scrape."""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._samples = {}
+        self._totals = {}
+
+    def record(self, label, bytes_in, blocked=0):
+        samples = self._samples.setdefault(label, deque(maxlen=self.window))
+        samples.append((bytes_in, blocked))
+        total = self._totals.setdefault(label, {"scrapes": 0, "bytes": 0, "blocked": 0})
+        total["scrapes"] += 1
+        total["bytes"] += bytes_in
+        total["blocked"] += blocked
+
+    def summary(self):
+        out = {}
+        for label, samples in list(self._samples.items()):
+            sizes = sorted(b for b, _ in samples)
+            total = self._totals[label]
+            out[label] = {
+                "scrapes": total["scrapes"],
+                "total_mb": round(total["bytes"] / 1_000_000, 2),
+                "blocked_requests": total["blocked"],
+                "avg_kb_per_scrape": round(sum(sizes) / len(sizes) / 1000, 1) if sizes else 0.0,
+                "p50_kb_per_scrape": round(sizes[len(sizes) // 2] / 1000, 1) if sizes else 0.0,
+            }
+        return out
+
+
+traffic_stats = TrafficStats()
+
+
+def _collect_traffic_metrics():
+    summary = traffic_stats.summary()
+    return [
+        ("scraper_scrapes_total", "counter", "Scrapes with recorded traffic, by fetcher.",
+         [({"fetcher": label}, s["scrapes"]) for label, s in summary.items()]),
+        ("scraper_received_bytes_total", "counter", "Bytes received by scrapes, by fetcher.",
+         [({"fetcher": label}, traffic_stats._totals[label]["bytes"]) for label in summary]),
+        ("scraper_blocked_requests_total", "counter", "Requests aborted by the request policy.",
+         [({"fetcher": label}, s["blocked_requests"]) for label, s in summary.items()]),
+    ]
+
+
+registry.register_collector(_collect_traffic_metrics)
+
+
+class PageTraffic:
+    """Counts bytes received and requests aborted on one page."""
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.blocked = 0
+        self._pending = []
+
+    def on_request_finished(self, request):
+        self._pending.append(asyncio.ensure_future(self._add_sizes(request)))
+
+    async def _add_sizes(self, request):
+        try:
+            sizes = await request.sizes()
+            self.bytes_in += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass
+
+    async def finish(self, label):
+        """Settle outstanding size lookups and record this scrape's traffic."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        traffic_stats.record(label, self.bytes_in, self.blocked)
+        print(f"Scraper: {label} scrape transferred {self.bytes_in / 1000:.0f}KB, blocked {self.blocked} request(s)")
+
+
+async def intercept_requests(page, label):
+    """
+    Apply `label`'s request policy to a page and start counting its traffic.
+    Call `await traffic.finish(label)` before the page is closed.
+    """
+    traffic = PageTraffic()
+    page.on("requestfinished", traffic.on_request_finished)
+
+    policy = POLICIES.get(label)
+    if policy:
+        async def _route(route):
+            request = route.request
+            if policy.should_block(request.resource_type, request.url):
+                traffic.blocked += 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await page.route("**/*", _route)
+    return traffic
@@ -0,0 +1,69 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class ScrapeCache:
+    """
+    TTL + LRU cache of successful scrape results, with single-flight
+    deduplication: concurrent requests for the same key share one scrape.
+    Error results are never cached.
+    """
+
+    def __init__(self, ttl=60.0, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_scrape(self, key, scrape):
+        """Return the cached result for `key`, or run `scrape()` (once) to fill it."""
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, result = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(result)
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(scrape())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+
+        # Shield so one caller giving up doesn't cancel the scrape for the others
+        return dict(await asyncio.shield(task))
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def _on_done(self, key, task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if result and "error" not in result:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def summary(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            "ttl_seconds": self.ttl,
+        }
@@ -0,0 +1,209 @@
+import asyncio
+import os
+import time
+from app.services.browser_pool import browser_pool
+from app.services.request_policy import intercept_requests
+from app.services.scrape_cache import ScrapeCache
+from app.services.video_identity import canonicalize, fallback_key, platform_of, short_link_resolver
+from app.services.scraper import _scrape_standalone
+from app.services.stats import RollingStats
+from app.services.admission import admission_from_env
+from app.services.extractors import build_extractors, run_hedged, is_valid, DEFAULT_HEDGE_DELAY, MIN_HEDGE_SAMPLES
+from app.services.metrics import registry, scrape_strategy_seconds
+
+# Extractor names per platform, cheapest first
+DEFAULT_EXTRACTORS = ("http", "ytdlp", "playwright")
+INSTAGRAM_EXTRACTORS = ("instagram_page",)
+
+
+class ScrapeEngine:
+    """
+    Asyncio scraping engine on top of the browser pool.
+    A semaphore bounds how many scrapes are in flight at once and every scrape
+    gets its own timeout, so one worker can drive many scrapes without a thread
+    per scrape.
+
+    TikTok scrapes are tiered over the registered extractors (see
+    extractors.py), cheapest first: a plain HTTP fetch of the server-rendered
+    HTML, then yt-dlp, then a Playwright page. With hedging on, the next tier
+    also starts when the current one is slower than its own p95. Instagram
+    URLs go through the same cache, admission and pool with their own
+    extractors, so mixed-platform batches share one pipeline.
+    Results are cached per video, and concurrent scrapes of the same video
+    share one in-flight scrape. Cache misses go through per-host admission
+    (rate limit + circuit breaker), so a blocking incident fails fast.
+    """
+
+    def __init__(self, pool, concurrency=16, timeout=45.0, http_fast_path=True, cache=None, admission=None,
+                 extractors=None, instagram_extractors=INSTAGRAM_EXTRACTORS, hedging=True):
+        self.pool = pool
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        # Extractors named explicitly warn when unavailable; the default chain skips missing optional ones quietly
+        names = extractors if extractors is not None else DEFAULT_EXTRACTORS
+        self.extractors = {
+            "tiktok": build_extractors(
+                self, [n for n in names if http_fast_path or n != "http"], warn_unavailable=extractors is not None
+            ),
+            "instagram": build_extractors(self, instagram_extractors),
+        }
+        self.hedging = hedging
+        # Success rate and latency of each extraction tier
+        self.tier_stats = RollingStats()
+        self.cache = cache or ScrapeCache()
+        self.admission = admission or admission_from_env()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def scrape(self, url):
+        """
+        Scrape a TikTok or Instagram video URL. Always returns a dict (an error
+        dict on failure). Short links are expanded first; successful results
+        carry the `video_id` (asset ID) when it is known.
+        """
+        platform = platform_of(url)
+        video_id, scrape_url = await canonicalize(url)
+        key = video_id or fallback_key(scrape_url)
+        result = await self.cache.get_or_scrape(key, lambda: self._scrape_tiered(scrape_url, platform))
+        if video_id and "error" not in result:
+            result.setdefault("video_id", video_id)
+        return result
+
+    async def _scrape_tiered(self, url, platform="tiktok"):
+        return await self._admitted(url, lambda: self._scrape_tiers(url, platform))
+
+    async def _scrape_tiers(self, url, platform):
+        async with self._semaphore:
+            result = await run_hedged(
+                self.extractors[platform],
+                lambda extractor: self._run_tier(extractor.name, extractor.extract(url), platform),
+                self._hedge_delay,
+            )
+        return result or {"error": "No extractor could get data for this video"}
+
+    def _hedge_delay(self, extractor):
+        """Seconds to give `extractor` before hedging: its p95 time to a successful result."""
+        if not self.hedging:
+            return None
+        p95 = self.tier_stats.quantile(extractor.name, 0.95, successes_only=True, min_samples=MIN_HEDGE_SAMPLES)
+        return min(self.timeout, p95 if p95 is not None else DEFAULT_HEDGE_DELAY)
+
+    async def _admitted(self, url, scrape):
+        rejection = await self.admission.admit(url)
+        if rejection:
+            print(f"Scraper: Not scraping {url}: {rejection['error']}")
+            return rejection
+        result = None
+        try:
+            result = await scrape()
+            return result
+        finally:
+            self.admission.record(url, result)
+
+    async def scrape_page(self, url, scrape_fn, site):
+        """
+        Scrape a URL with a browser page only, using `scrape_fn(page, url)`.
+        `site` selects the request-blocking policy and labels traffic stats.
+        """
+        async def _scrape():
+            async with self._semaphore:
+                return await self._scrape_page(scrape_fn, url, site)
+
+        return await self._admitted(url, _scrape)
+
+    async def scrape_many(self, jobs):
+        """
+        Scrape many TikTok / Instagram URLs concurrently.
+        `jobs` is an iterable of (key, url) pairs; yields (key, result) pairs
+        in completion order.
+        """
+        async def _run(key, url):
+            return key, await self.scrape(url)
+
+        tasks = [asyncio.create_task(_run(key, url)) for key, url in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def close(self):
+        for extractors in self.extractors.values():
+            for extractor in extractors:
+                await extractor.close()
+        await short_link_resolver.close()
+
+    async def _run_tier(self, tier, coro, site="tiktok"):
+        start = time.perf_counter()
+        result = await coro
+        ok = is_valid(result)
+        elapsed = time.perf_counter() - start
+        self.tier_stats.record(tier, elapsed, ok)
+        scrape_strategy_seconds.observe(elapsed, strategy=f"tier_{tier}", site=site, outcome="success" if ok else "failure")
+        return result
+
+    async def _scrape_page(self, scrape_fn, url, site):
+        print(f"Scraper: Fetching data for: {url}")
+
+        async def _intercepted(page, url):
+            traffic = await intercept_requests(page, site)
+            try:
+                return await scrape_fn(page, url)
+            finally:
+                await traffic.finish(site)
+
+        try:
+            if not self.pool.running:
+                return await asyncio.wait_for(_scrape_standalone(_intercepted, url), self.timeout)
+            # The timeout starts once a page is leased, not while queueing for one;
+            # a browser crash mid-scrape gets one retry on a fresh lease
+            return await self.pool.run(lambda page: asyncio.wait_for(_intercepted(page, url), self.timeout))
+        except asyncio.TimeoutError:
+            print(f"Scraper: Timed out after {self.timeout}s for {url}")
+            return {"error": f"Scrape timed out after {self.timeout:g}s"}
+        except Exception as e:
+            print(f"Scraper error: {e}")
+            return {"error": f"Scraper error: {str(e)}"}
+
+
+scrape_engine = ScrapeEngine(
+    browser_pool,
+    concurrency=int(os.getenv("SCRAPER_CONCURRENCY", "16")),
+    timeout=float(os.getenv("SCRAPER_TIMEOUT", "45")),
+    http_fast_path=os.getenv("SCRAPER_HTTP_FAST_PATH", "1") != "0",
+    extractors=[n.strip() for n in os.getenv("SCRAPER_EXTRACTORS", "").split(",") if n.strip()] or None,
+    hedging=os.getenv("SCRAPER_HEDGING", "1") != "0",
+    cache=ScrapeCache(
+        ttl=float(os.getenv("SCRAPE_CACHE_TTL", "60")),
+        max_entries=int(os.getenv("SCRAPE_CACHE_SIZE", "1000")),
+    ),
+)
+
+
+def _collect_cache_metrics():
+    summary = scrape_engine.cache.summary()
+    return [
+        ("scraper_cache_requests_total", "counter", "Scrape cache lookups by result.", [
+            ({"result": "hit"}, summary["hits"]),
+            ({"result": "miss"}, summary["misses"]),
+            ({"result": "coalesced"}, summary["coalesced"]),
+        ]),
+        ("scraper_cache_entries", "gauge", "Videos currently cached.", [({}, summary["entries"])]),
+        ("scraper_in_flight", "gauge", "Distinct videos being scraped right now.", [({}, summary["in_flight"])]),
+    ]
+
+
+def _collect_admission_metrics():
+    hosts = scrape_engine.admission.summary()["hosts"]
+    return [
+        ("scraper_breaker_open", "gauge", "1 while the host's circuit breaker is open or half-open.",
+         [({"host": host}, int(s["state"] != "closed")) for host, s in hosts.items()]),
+        ("scraper_breaker_rejected_total", "counter", "Scrapes failed fast by an open circuit breaker.",
+         [({"host": host}, s["rejected"]) for host, s in hosts.items()]),
+        ("scraper_rate_limited_total", "counter", "Scrapes rejected because the host's rate limit was exhausted.",
+         [({}, scrape_engine.admission.rate_limited)]),
+    ]
+
+
+registry.register_collector(_collect_cache_metrics)
+registry.register_collector(_collect_admission_metrics)
@@ -0,0 +1,309 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS scrape_jobs_status ON scrape_jobs (status, id);
+"""
+
+
+class ScrapeQueue:
+    """
+    Durable scrape job queue in a local SQLite file, shared by the API
+    (which enqueues and reads results) and scrape worker processes (which
+    claim and complete jobs). Workers renew the lease on their running jobs
+    (`heartbeat`); jobs whose worker stops renewing are put back after
+    `lease_seconds`, up to `max_attempts` times. Jobs nobody waits for any
+    more are `abandon`ed: workers skip or drop them.
+    """
+
+    def __init__(self, path, lease_seconds=120.0, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._initialized = True
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, urls):
+        """Add one job per URL; returns their job IDs in order."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            ids = [
+                conn.execute("INSERT INTO scrape_jobs (url, created_at) VALUES (?, ?)", (url, now)).lastrowid
+                for url in urls
+            ]
+            conn.execute("COMMIT")
+        return ids
+
+    def claim(self, worker, limit):
+        """Atomically take up to `limit` queued jobs (oldest first); returns [(id, url)]."""
+        now = time.time()
+        with self._connect() as conn:
+            # IMMEDIATE takes the write lock up front, so two workers can't claim the same rows
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, url FROM scrape_jobs WHERE status = 'queued' ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE scrape_jobs SET status = 'running', worker = ?, claimed_at = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                [(worker, now, job_id) for job_id, _ in rows],
+            )
+            conn.execute("COMMIT")
+        return rows
+
+    def complete(self, job_id, result):
+        status = "failed" if not result or "error" in result else "done"
+        with self._connect() as conn:
+            # Abandoned jobs stay abandoned
+            conn.execute(
+                "UPDATE scrape_jobs SET status = ?, result = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                (status, json.dumps(result or {}), time.time(), job_id),
+            )
+
+    def heartbeat(self, worker, job_ids):
+        """Renew `worker`'s lease on its running jobs; returns the ids it still holds."""
+        if not job_ids:
+            return set()
+        ids = list(job_ids)
+        held = set()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                conn.execute(
+                    f"UPDATE scrape_jobs SET claimed_at = ? WHERE id IN ({marks}) AND status = 'running' AND worker = ?",
+                    [now, *chunk, worker],
+                )
+                held.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM scrape_jobs WHERE id IN ({marks}) AND status = 'running' AND worker = ?",
+                    [*chunk, worker],
+                ))
+            conn.execute("COMMIT")
+        return held
+
+    def abandon(self, job_ids):
+        """Give up on unfinished jobs (their waiter timed out) so no worker spends a scrape on them."""
+        ids = list(job_ids)
+        with self._connect() as conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                conn.execute(
+                    f"UPDATE scrape_jobs SET status = 'abandoned', finished_at = ? "
+                    f"WHERE id IN ({','.join('?' * len(chunk))}) AND status IN ('queued', 'running')",
+                    [time.time(), *chunk],
+                )
+
+    def requeue_stale(self):
+        """Put back jobs whose worker stopped responding; give up on ones that keep failing."""
+        cutoff = time.time() - self.lease_seconds
+        error = json.dumps({"error": f"Scrape worker died {self.max_attempts} times on this job"})
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE scrape_jobs SET status = 'failed', result = ?, finished_at = ? "
+                "WHERE status = 'running' AND claimed_at < ? AND attempts >= ?",
+                (error, time.time(), cutoff, self.max_attempts),
+            )
+            requeued = conn.execute(
+                "UPDATE scrape_jobs SET status = 'queued', worker = NULL "
+                "WHERE status = 'running' AND claimed_at < ?",
+                (cutoff,),
+            ).rowcount
+            conn.execute("COMMIT")
+        return requeued
+
+    def results(self, job_ids):
+        """{job_id: result dict} for the given jobs that have finished."""
+        return self.progress(job_ids)[0]
+
+    def progress(self, job_ids):
+        """({job_id: result dict} for finished jobs, {job_id} of jobs a worker is running)."""
+        if not job_ids:
+            return {}, set()
+        out = {}
+        running = set()
+        ids = list(job_ids)
+        with self._connect() as conn:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT id, status, result FROM scrape_jobs WHERE id IN ({','.join('?' * len(chunk))}) "
+                    "AND status IN ('running', 'done', 'failed')",
+                    chunk,
+                ).fetchall()
+                for job_id, status, result in rows:
+                    if status == "running":
+                        running.add(job_id)
+                    else:
+                        out[job_id] = json.loads(result)
+        return out, running
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, url, status, result, attempts, created_at, finished_at FROM scrape_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row[0],
+            "url": row[1],
+            "status": row[2],
+            "result": json.loads(row[3]) if row[3] else None,
+            "attempts": row[4],
+            "created_at": row[5],
+            "finished_at": row[6],
+        }
+
+    def purge(self, older_than_seconds=86400):
+        """Delete finished jobs older than the cutoff."""
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM scrape_jobs WHERE status IN ('done', 'failed', 'abandoned') AND finished_at < ?",
+                (time.time() - older_than_seconds,),
+            ).rowcount
+
+    def summary(self):
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM scrape_jobs GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT MIN(created_at) FROM scrape_jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "abandoned": counts.get("abandoned", 0),
+            "oldest_queued_s": round(time.time() - oldest, 1) if oldest else 0.0,
+        }
+
+
+class QueueScraper:
+    """
+    Drop-in for ScrapeEngine.scrape / scrape_many in the API process when
+    scraping runs in separate worker processes: jobs are enqueued and their
+    results awaited. One poll loop serves every waiting request. A job gets
+    `timeout` seconds once a worker picks it up, and may sit in the queue for
+    up to `queue_timeout` before that (bulk refreshes enqueue far more jobs
+    than workers run at once).
+    """
+
+    def __init__(self, queue, timeout=120.0, queue_timeout=1800.0, poll_interval=0.05, max_poll_interval=0.5):
+        self.queue = queue
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        # job_id -> (result future, event set once a worker has claimed the job)
+        self._waiters = {}
+        self._poller = None
+
+    async def submit(self, urls):
+        """Enqueue URLs without waiting; returns job IDs (poll them with ScrapeQueue.get)."""
+        return await asyncio.to_thread(self.queue.enqueue, list(urls))
+
+    async def scrape(self, url):
+        (job_id,) = await self.submit([url])
+        return await self._wait(job_id)
+
+    async def scrape_many(self, jobs):
+        """Same contract as ScrapeEngine.scrape_many: yields (key, result) in completion order."""
+        jobs = list(jobs)
+        job_ids = await self.submit(url for _, url in jobs)
+
+        async def _run(key, job_id):
+            return key, await self._wait(job_id)
+
+        tasks = [asyncio.create_task(_run(key, job_id)) for (key, _), job_id in zip(jobs, job_ids)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _wait(self, job_id):
+        future = asyncio.get_running_loop().create_future()
+        claimed = asyncio.Event()
+        self._waiters[job_id] = (future, claimed)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll())
+        try:
+            try:
+                await asyncio.wait_for(claimed.wait(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                error = f"Scrape job {job_id} still queued after {self.queue_timeout:g}s"
+            else:
+                try:
+                    return await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    error = f"Scrape job {job_id} not finished {self.timeout:g}s after a worker took it"
+            # Nobody will read this result; stop workers from (still) scraping it
+            try:
+                await asyncio.to_thread(self.queue.abandon, [job_id])
+            except Exception as e:
+                print(f"ScrapeQueue: Could not abandon job {job_id}: {e}")
+            return {"error": error}
+        finally:
+            self._waiters.pop(job_id, None)
+
+    async def _poll(self):
+        interval = self.poll_interval
+        while self._waiters:
+            await asyncio.sleep(interval)
+            try:
+                finished, running = await asyncio.to_thread(self.queue.progress, list(self._waiters))
+            except Exception as e:
+                print(f"ScrapeQueue: Polling failed: {e}")
+                finished, running = {}, set()
+            for job_id in running:
+                waiter = self._waiters.get(job_id)
+                if waiter:
+                    waiter[1].set()
+            for job_id, result in finished.items():
+                waiter = self._waiters.get(job_id)
+                if waiter and not waiter[0].done():
+                    waiter[0].set_result(result)
+                    waiter[1].set()
+            # Back off while nothing is finishing, snap back when results arrive
+            interval = self.poll_interval if finished else min(self.max_poll_interval, interval * 2)
+
+    async def close(self):
+        if self._poller:
+            self._poller.cancel()
+
+
+scrape_queue = ScrapeQueue(
+    os.getenv("SCRAPE_QUEUE_PATH", "scrape_queue.db"),
+    lease_seconds=float(os.getenv("SCRAPE_JOB_LEASE", "120")),
+)
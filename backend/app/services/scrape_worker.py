@@ -0,0 +1,100 @@
+import sys
+import os
+import socket
+import asyncio
+import argparse
+from app.services.browser_pool import browser_pool
+from app.services.scrape_engine import scrape_engine
+from app.services.scrape_queue import scrape_queue
+
+
+async def run_worker(queue=scrape_queue, engine=scrape_engine, pool=browser_pool, idle_interval=0.25, name=None):
+    """
+    Scrape worker loop: claim jobs from the queue, scrape them concurrently on
+    this process's own browser pool, and write each result back as soon as
+    it finishes. A heartbeat renews the lease on running jobs, so slow but
+    healthy scrapes aren't handed to another worker, and drops jobs that were
+    abandoned or taken away. Runs until cancelled.
+    """
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    in_flight = {}
+    slots = asyncio.Semaphore(engine.concurrency)
+
+    async def _heartbeat():
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 4)
+            try:
+                held = await asyncio.to_thread(queue.heartbeat, name, list(in_flight))
+            except Exception as e:
+                print(f"ScrapeWorker: Heartbeat failed: {e}")
+                continue
+            for job_id, task in list(in_flight.items()):
+                if job_id not in held:
+                    print(f"ScrapeWorker: Dropping job {job_id} (abandoned or re-queued)")
+                    task.cancel()
+
+    async def _run(job_id, url):
+        try:
+            result = await engine.scrape(url)
+        except Exception as e:
+            result = {"error": f"Scraper error: {str(e)}"}
+        finally:
+            slots.release()
+        await asyncio.to_thread(queue.complete, job_id, result)
+
+    def _done(job_id):
+        return lambda _: in_flight.pop(job_id, None)
+
+    await pool.start()
+    print(f"ScrapeWorker: {name} consuming {queue.path} with {engine.concurrency} slot(s)")
+    heartbeat = asyncio.create_task(_heartbeat())
+    try:
+        while True:
+            requeued = await asyncio.to_thread(queue.requeue_stale)
+            if requeued:
+                print(f"ScrapeWorker: Re-queued {requeued} job(s) from dead workers")
+
+            # Only claim what we can start now, so other workers get the rest
+            await slots.acquire()
+            free = 1
+            while free < engine.concurrency and not slots.locked():
+                await slots.acquire()
+                free += 1
+            jobs = await asyncio.to_thread(queue.claim, name, free)
+            for _ in range(free - len(jobs)):
+                slots.release()
+            for job_id, url in jobs:
+                task = asyncio.create_task(_run(job_id, url))
+                in_flight[job_id] = task
+                task.add_done_callback(_done(job_id))
+            if not jobs:
+                await asyncio.sleep(idle_interval)
+    finally:
+        heartbeat.cancel()
+        for task in list(in_flight.values()):
+            task.cancel()
+        await engine.close()
+        await pool.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a scrape worker against the local scrape job queue.")
+    parser.add_argument("--queue", help="SQLite queue file (default: SCRAPE_QUEUE_PATH or scrape_queue.db)")
+    parser.add_argument("--purge-after", type=float, default=86400,
+                        help="Delete finished jobs older than this many seconds on startup (default: 1 day)")
+    args = parser.parse_args(argv)
+
+    if args.queue:
+        scrape_queue.path = args.queue
+    purged = scrape_queue.purge(args.purge_after)
+    if purged:
+        print(f"ScrapeWorker: Purged {purged} old job(s)")
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
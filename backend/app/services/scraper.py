@@ -1,96 +1,143 @@
+import asyncio
 import json
-from playwright.sync_api import sync_playwright
-from playwright_stealth import stealth_sync
+import re
+import time
+from playwright.async_api import async_playwright
+from playwright_stealth import stealth_async
+from app.services.browser_pool import browser_pool, USER_AGENT, LAUNCH_ARGS
+from app.services.hydration import extract_video_fields
+from app.services.video_identity import extract_video_id, extract_instagram_id
+from app.services.metrics import scrape_phase_seconds, scrape_strategy_seconds, timed
+from app.services.strategy_stats import strategy_stats
+from app.services.readiness import wait_until_ready, TIKTOK_READY_SELECTOR, INSTA_READY_SELECTOR
 
 
 def get_tiktok_data(url):
     """
     Scrape TikTok video data using Playwright (headless browser).
     Returns dict with views, likes, author, thumbnail — or an error dict.
+    Leases a page from the shared browser pool when it is running, otherwise
+    launches a one-off browser (e.g. when called from a CLI script).
     """
     print(f"Scraper: Fetching TikTok data for: {url}")
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=True,
-                args=["--disable-blink-features=AutomationControlled"],
-            )
-            context = browser.new_context(
-                user_agent=(
-                    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/131.0.0.0 Safari/537.36"
-                )
-            )
-            page = context.new_page()
-
-            # Apply stealth to avoid bot detection
-            stealth_sync(page)
-
-            page.goto(url, timeout=30000, wait_until="domcontentloaded")
-            # Give TikTok time to hydrate client-side data
-            page.wait_for_timeout(5000)
-
-            final_url = page.url
-            print(f"Scraper: Final URL after navigation: {final_url}")
-
-            # --- Strategy 1: Extract from hydration JSON blob ---
-            result = _extract_from_json(page)
-            if result:
-                browser.close()
-                return result
-
-            # --- Strategy 2: CSS selector fallback ---
-            result = _extract_from_selectors(page)
-            if result:
-                browser.close()
-                return result
-
-            print("Scraper: All extraction strategies failed.")
-            browser.close()
-            return {
-                "error": "Could not find data blob. TikTok may be blocking the request. "
-                         "Try a full tiktok.com URL (not a shortened link)."
-            }
-
+        return _run_scrape(scrape_tiktok_page, url)
     except Exception as e:
         print(f"Scraper error: {e}")
         return {"error": f"Scraper error: {str(e)}"}
 
 
-def _extract_from_json(page):
-    """Try to extract video data from TikTok's hydration script tags."""
-    for script_id in ["__UNIVERSAL_DATA_FOR_REHYDRATION__", "SIGI_STATE"]:
+async def scrape_tiktok_page(page, url):
+    """Navigate an already-prepared page to a TikTok video and extract its stats."""
+    with timed(scrape_phase_seconds, phase="goto", site="tiktok"):
+        await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+    # Wait until the hydration blob or the count elements exist (bounded)
+    await wait_until_ready(page, TIKTOK_READY_SELECTOR, label="tiktok")
+
+    final_url = page.url
+    print(f"Scraper: Final URL after navigation: {final_url}")
+
+    # Hydration JSON blobs and the CSS selector fallback, cheapest expected cost first
+    for name in strategy_stats.order("tiktok_page", list(PAGE_STRATEGIES)):
+        start = time.perf_counter()
+        with timed(scrape_strategy_seconds, strategy=name, site="tiktok") as span:
+            result = await PAGE_STRATEGIES[name](page)
+            span.succeed_if(result)
+        strategy_stats.record("tiktok_page", name, time.perf_counter() - start, bool(result))
+        if result:
+            return result
+
+    print("Scraper: All extraction strategies failed.")
+    return {
+        "error": "Could not find data blob. TikTok may be blocking the request. "
+                 "Try a full tiktok.com URL (not a shortened link)."
+    }
+
+
+def _run_scrape(scrape_fn, url):
+    """Run an async page scrape from synchronous code."""
+    if browser_pool.running:
+        return browser_pool.run_sync(scrape_fn, url)
+    return asyncio.run(_scrape_standalone(scrape_fn, url))
+
+
+async def _scrape_standalone(scrape_fn, url):
+    """Launch a throwaway browser for a single scrape (no pool running)."""
+    async with async_playwright() as p:
+        with timed(scrape_phase_seconds, phase="launch", site="standalone"):
+            browser = await p.chromium.launch(headless=True, args=LAUNCH_ARGS)
         try:
-            handle = page.query_selector(f'script[id="{script_id}"]')
-            if not handle:
-                continue
-
-            json_text = handle.inner_text()
-            data = json.loads(json_text)
-
-            # Path 1: __DEFAULT_SCOPE__ structure
-            try:
-                video_data = data["__DEFAULT_SCOPE__"]["webapp.video-detail"]["itemInfo"]["itemStruct"]
-                return _format_video_data(video_data)
-            except (KeyError, TypeError):
-                pass
-
-            # Path 2: ItemModule structure
-            item_module = data.get("ItemModule", {})
-            if item_module:
-                video_id = list(item_module.keys())[0]
-                return _format_video_data(item_module[video_id])
-
-        except Exception as e:
-            print(f"Scraper: JSON extraction from {script_id} failed: {e}")
-            continue
+            context = await browser.new_context(user_agent=USER_AGENT)
+            page = await context.new_page()
+            # Apply stealth to avoid bot detection
+            await stealth_async(page)
+            return await scrape_fn(page, url)
+        finally:
+            await browser.close()
+
+
+HYDRATION_SCRIPT_IDS = ["__UNIVERSAL_DATA_FOR_REHYDRATION__", "SIGI_STATE"]
+
+
+async def _extract_from_json(page):
+    """Try to extract video data from TikTok's hydration script tags."""
+    for script_id in HYDRATION_SCRIPT_IDS:
+        result = await _extract_from_script(page, script_id)
+        if result:
+            return result
+    return None
+
+
+async def _extract_from_script(page, script_id):
+    """Extract video data from one hydration script tag, if the page has it."""
+    try:
+        handle = await page.query_selector(f'script[id="{script_id}"]')
+        if not handle:
+            return None
+        return parse_hydration_json(await handle.inner_text())
+    except Exception as e:
+        print(f"Scraper: JSON extraction from {script_id} failed: {e}")
+        return None
+
+
+def parse_hydration_json(json_text):
+    """
+    Pull the video stats out of a hydration blob's text.
+    Shared by the browser path and the HTTP fast path; returns None if
+    neither known structure is present.
+    Only the fields we use are decoded (see hydration.py); the full
+    json.loads path is kept as a fallback if the targeted parse chokes.
+    """
+    try:
+        video_data = extract_video_fields(json_text)
+        return _format_video_data(video_data) if video_data else None
+    except ValueError as e:
+        print(f"Scraper: Targeted JSON extraction failed, parsing full blob: {e}")
+
+    return _parse_full_hydration_json(json_text)
+
+
+def _parse_full_hydration_json(json_text):
+    data = json.loads(json_text)
+
+    # Path 1: __DEFAULT_SCOPE__ structure
+    try:
+        video_data = data["__DEFAULT_SCOPE__"]["webapp.video-detail"]["itemInfo"]["itemStruct"]
+        return _format_video_data(video_data)
+    except (KeyError, TypeError):
+        pass
+
+    # Path 2: ItemModule structure
+    item_module = data.get("ItemModule", {})
+    if item_module:
+        video_id = list(item_module.keys())[0]
+        return _format_video_data(item_module[video_id])
 
     return None
 
 
-def _extract_from_selectors(page):
+async def _extract_from_selectors(page):
     """Fallback: extract data from visible DOM elements."""
     try:
         views = 0
@@ -98,15 +145,15 @@ def _extract_from_selectors(page):
         author = "unknown"
 
         # Like count
-        like_el = page.query_selector('[data-e2e="like-count"]')
+        like_el = await page.query_selector('[data-e2e="like-count"]')
         if like_el:
-            likes = _parse_abbreviated_count(like_el.inner_text())
+            likes = _parse_abbreviated_count(await like_el.inner_text())
 
         # View count (browse-count or play count in video detail)
         for selector in ['[data-e2e="video-play-count"]', '[data-e2e="browse-video-count"]']:
-            view_el = page.query_selector(selector)
+            view_el = await page.query_selector(selector)
             if view_el:
-                views = _parse_abbreviated_count(view_el.inner_text())
+                views = _parse_abbreviated_count(await view_el.inner_text())
                 break
 
         # Author from the URL
@@ -116,18 +163,31 @@ def _extract_from_selectors(page):
 
         if views or likes:
             print(f"Scraper: Extracted from selectors - Views: {views}, Likes: {likes}, Author: {author}")
-            return {
+            result = {
                 "views": views,
                 "likes": likes,
                 "author": author,
                 "thumbnail": "",
             }
+            # The final URL has the video ID even if we were given a short link
+            video_id = extract_video_id(current_url)
+            if video_id:
+                result["video_id"] = video_id
+            return result
     except Exception as e:
         print(f"Scraper: Selector extraction failed: {e}")
 
     return None
 
 
+# Page strategies by name, in default order
+PAGE_STRATEGIES = {
+    "universal_data": lambda page: _extract_from_script(page, "__UNIVERSAL_DATA_FOR_REHYDRATION__"),
+    "sigi_state": lambda page: _extract_from_script(page, "SIGI_STATE"),
+    "selectors": lambda page: _extract_from_selectors(page),
+}
+
+
 def _format_video_data(video_data):
     """Format the extracted video data into the standard return dict."""
     author_field = video_data.get("author", {})
@@ -142,10 +202,21 @@ def _format_video_data(video_data):
         "author": author,
         "thumbnail": video_data.get("video", {}).get("cover", ""),
     }
+    if video_data.get("id"):
+        result["video_id"] = str(video_data["id"])
     print(f"Scraper: Extracted from JSON - Views: {result['views']}, Likes: {result['likes']}, Author: {result['author']}")
     return result
 
 
+_COUNT_TEXT_RE = re.compile(r"\d[\d,.]*\s*[KMB]?", re.IGNORECASE)
+
+
+def _parse_count_text(text):
+    """Parse the first count in text such as '1.2M views' or '12,345 likes'."""
+    match = _COUNT_TEXT_RE.search(text or "")
+    return _parse_abbreviated_count(match.group(0).replace(" ", "")) if match else 0
+
+
 def _parse_abbreviated_count(text):
     """Parse abbreviated counts like '1.2M', '500K', '3.4B' into integers."""
     text = text.strip().upper()
@@ -161,16 +232,87 @@ def _parse_abbreviated_count(text):
     except (ValueError, IndexError):
         return 0
 
+# og:description looks like "1,234 likes, 56 comments - someuser on March 3, 2024: ..."
+_INSTA_DESCRIPTION_RE = re.compile(
+    r"(?P<likes>\d[\d,.]*\s*[KMB]?)\s+likes?\b.*?-\s+(?P<author>[\w.]+)\s+on\s", re.IGNORECASE
+)
+
+
 def get_insta_data(url):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto(url)
-        # Give IG a moment to load
-        page.wait_for_timeout(3000) 
-        
-        # This is a common selector for IG view counts, but IG changes these often
-        view_text = page.inner_text("span:has-text('views')") 
-        
-        browser.close()
-        return {"views": view_text}
\ No newline at end of file
+    """
+    Scrape an Instagram post or reel.
+    Returns the same dict shape as get_tiktok_data (integer views and likes,
+    author, thumbnail, video_id) — or an error dict.
+    """
+    print(f"Scraper: Fetching Instagram data for: {url}")
+
+    try:
+        return _run_scrape(scrape_insta_page, url)
+    except Exception as e:
+        print(f"Scraper error: {e}")
+        return {"error": f"Scraper error: {str(e)}"}
+
+
+async def scrape_insta_page(page, url):
+    """Navigate an already-prepared page to an Instagram post / reel and extract its stats."""
+    with timed(scrape_phase_seconds, phase="goto", site="instagram"):
+        await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+    await wait_until_ready(page, INSTA_READY_SELECTOR, label="instagram")
+
+    with timed(scrape_strategy_seconds, strategy="instagram_page", site="instagram") as span:
+        result = await _extract_insta_stats(page, url)
+        span.succeed_if(result)
+    if result:
+        return result
+
+    print("Scraper: Instagram extraction failed.")
+    return {"error": "Could not find Instagram counts. Instagram may be showing a login wall."}
+
+
+async def _extract_insta_stats(page, url):
+    """Views from the rendered count, likes / author / thumbnail from the page's meta tags."""
+    try:
+        views = 0
+        likes = 0
+        author = "unknown"
+
+        # IG changes its markup often; the "N views" text has been the most stable hook
+        view_el = await page.query_selector("span:has-text('views')")
+        if view_el:
+            views = _parse_count_text(await view_el.inner_text())
+
+        description = (await _meta_content(page, 'meta[property="og:description"]')
+                       or await _meta_content(page, 'meta[name="description"]'))
+        match = _INSTA_DESCRIPTION_RE.search(description)
+        if match:
+            likes = _parse_count_text(match.group("likes"))
+            author = match.group("author")
+        else:
+            like_el = await page.query_selector("span:has-text('likes')")
+            if like_el:
+                likes = _parse_count_text(await like_el.inner_text())
+
+        if not (views or likes):
+            return None
+
+        result = {
+            "views": views,
+            "likes": likes,
+            "author": author,
+            "thumbnail": await _meta_content(page, 'meta[property="og:image"]'),
+        }
+        video_id = extract_instagram_id(page.url) or extract_instagram_id(url)
+        if video_id:
+            result["video_id"] = video_id
+        print(f"Scraper: Extracted from Instagram - Views: {views}, Likes: {likes}, Author: {author}")
+        return result
+    except Exception as e:
+        print(f"Scraper: Instagram extraction failed: {e}")
+        return None
+
+
+async def _meta_content(page, selector):
+    handle = await page.query_selector(selector)
+    if not handle:
+        return ""
+    return await handle.get_attribute("content") or ""
@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # optional: enables application/x-msgpack responses
+    msgpack = None
+
+MSGPACK_TYPE = "application/x-msgpack"
+
+
+def _naive_utc(ts):
+    """ISO timestamp without an offset, shifted to UTC if it had one."""
+    ts = str(ts)
+    if ts.endswith("Z"):
+        return ts[:-1]
+    if ts.endswith("+00:00"):
+        return ts[:-6]
+    if len(ts) > 10 and ts[-6] in "+-" and ts[-3] == ":":
+        return datetime.fromisoformat(ts).astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+    return ts
+
+
+def epoch_seconds(timestamps):
+    """Float epoch seconds for ISO timestamps (naive ones are UTC)."""
+    # numpy parses offsets with a DeprecationWarning (an error in later versions); hand it naive UTC
+    return np.array([_naive_utc(ts) for ts in timestamps], dtype="datetime64[us]").astype(np.int64) / 1e6
+
+
+def _deltas(values):
+    """First value as is, then differences: [10, 12, 15] -> [10, 2, 3]."""
+    return np.diff(np.asarray(values, dtype=np.int64), prepend=0).tolist()
+
+
+def encode_series(view_history, like_history=None):
+    """
+    Columnar form of [{"count", "timestamp"}] view / like histories:
+    {"t": [...], "views": [...], "likes": [...]} where "t" holds whole epoch
+    seconds and every column is delta-encoded (first entry absolute, then
+    differences). Likes share "t" when they were recorded with the views,
+    as history_store writes them; otherwise they get their own "likes_t".
+    """
+    view_history = view_history or []
+    like_history = like_history or []
+    t = np.rint(epoch_seconds([p["timestamp"] for p in view_history])).astype(np.int64) if view_history else []
+    out = {"t": _deltas(t), "views": _deltas([p["count"] for p in view_history])}
+    if len(like_history) == len(view_history) and all(
+        lp["timestamp"] == vp["timestamp"] for lp, vp in zip(like_history, view_history)
+    ):
+        out["likes"] = _deltas([p["count"] for p in like_history])
+    else:
+        like_t = np.rint(epoch_seconds([p["timestamp"] for p in like_history])).astype(np.int64) if like_history else []
+        out["likes_t"] = _deltas(like_t)
+        out["likes"] = _deltas([p["count"] for p in like_history])
+    return out
+
+
+def decode_series(series):
+    """Inverse of encode_series, with ISO timestamps (UTC, whole seconds)."""
+    def points(t, counts):
+        times = np.cumsum(np.asarray(t, dtype=np.int64)).astype("datetime64[s]").astype(str)
+        return [{"count": int(c), "timestamp": str(ts)} for ts, c in zip(times, np.cumsum(np.asarray(counts, dtype=np.int64)))]
+
+    return {
+        "view_history": points(series["t"], series["views"]),
+        "like_history": points(series.get("likes_t", series["t"]), series["likes"]),
+    }
+
+
+def wants_msgpack(accept):
+    """Whether an Accept header asks for MessagePack and we can produce it."""
+    return msgpack is not None and MSGPACK_TYPE in (accept or "")
+
+
+def pack(obj):
+    return msgpack.packb(obj, use_bin_type=True)
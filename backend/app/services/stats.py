@@ -0,0 +1,46 @@
+from collections import deque
+
+
+class RollingStats:
+    """
+    Rolling window of (duration, success) samples per label.
+    Used for scraper health numbers such as readiness waits and extractor tiers.
+    """
+
+    def __init__(self, window=500):
+        self.window = window
+        self._samples = {}
+
+    def record(self, label, seconds, ok):
+        samples = self._samples.setdefault(label, deque(maxlen=self.window))
+        samples.append((seconds, ok))
+
+    def summary(self):
+        out = {}
+        for label, samples in list(self._samples.items()):
+            durations = sorted(s for s, _ in samples)
+            successes = sum(1 for _, ok in samples if ok)
+            out[label] = {
+                "samples": len(durations),
+                "successes": successes,
+                "failures": len(durations) - successes,
+                "success_rate": round(successes / len(durations), 3) if durations else 0.0,
+                "p50_ms": round(percentile(durations, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(durations, 0.95) * 1000, 1),
+            }
+        return out
+
+    def quantile(self, label, q, successes_only=False, min_samples=1):
+        """Percentile of `label`'s durations in seconds, or None with fewer than `min_samples`."""
+        durations = sorted(s for s, ok in self._samples.get(label, ()) if ok or not successes_only)
+        if len(durations) < max(1, min_samples):
+            return None
+        return percentile(durations, q)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (0.0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
@@ -0,0 +1,130 @@
+import random
+from app.services.stats import RollingStats
+from app.services.metrics import registry
+
+
+class StrategyStats(RollingStats):
+    """
+    Rolling success rate and latency of interchangeable extraction strategies
+    (page strategies, hydration JSON paths), used to try them cheapest-first.
+
+    A strategy's expected cost to success is its mean attempt time divided
+    by its success rate, and trying strategies in increasing order of that
+    minimises the expected time to the first hit. Until every strategy in a
+    group has `min_samples` attempts the default order is kept; afterwards
+    the default order is still used for `explore` of calls, so demoted
+    strategies keep being sampled and can win back their place.
+
+    A strategy is flagged as drifting when its recent hit rate drops below
+    `drift_ratio` of what it used to be, which usually means TikTok changed
+    its markup, and stays flagged until the hit rate recovers.
+    """
+
+    def __init__(self, window=300, recent=30, min_samples=20, explore=0.05, drift_ratio=0.3, drift_min_baseline=0.5):
+        super().__init__(window)
+        self.recent = recent
+        self.min_samples = min_samples
+        self.explore = explore
+        self.drift_ratio = drift_ratio
+        self.drift_min_baseline = drift_min_baseline
+        self._groups = {}
+        self._drifting = set()
+
+    def record(self, group, name, seconds, ok):
+        self._groups.setdefault(group, [])
+        if name not in self._groups[group]:
+            self._groups[group].append(name)
+        label = f"{group}/{name}"
+        super().record(label, seconds, ok)
+
+        drifting = self._is_drifting(label)
+        if drifting and label not in self._drifting:
+            self._drifting.add(label)
+            print(f"Scraper: Schema drift? {label} hit rate collapsed ({self._recent_rate(label):.0%} recently)")
+        elif not drifting and label in self._drifting:
+            self._drifting.discard(label)
+            print(f"Scraper: {label} is hitting again")
+
+    def expected_cost(self, group, name):
+        """
+        Mean seconds spent per successful result, or None without enough samples.
+        The success rate comes from the `recent` attempts only, so a strategy
+        that stops working is demoted quickly.
+        """
+        label = f"{group}/{name}"
+        samples = self._samples.get(label)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        mean_seconds = sum(s for s, _ in samples) / len(samples)
+        return mean_seconds / max(self._recent_rate(label), 0.01)
+
+    def order(self, group, names, explore=True):
+        """`names` (given in default order) sorted cheapest expected cost to success first."""
+        costs = [self.expected_cost(group, name) for name in names]
+        if any(cost is None for cost in costs) or (explore and random.random() < self.explore):
+            return list(names)
+        return [name for _, _, name in sorted(zip(costs, range(len(names)), names))]
+
+    def drifting(self):
+        return sorted(self._drifting)
+
+    def _recent_rate(self, label):
+        recent = list(self._samples[label])[-self.recent:]
+        return sum(1 for _, ok in recent if ok) / len(recent)
+
+    def _is_drifting(self, label):
+        if label in self._drifting:
+            # Stays flagged until it recovers, not just until the old baseline ages out
+            return self._recent_rate(label) < self.drift_min_baseline
+        samples = list(self._samples[label])
+        baseline = samples[:-self.recent]
+        if len(baseline) < self.min_samples:
+            return False
+        baseline_rate = sum(1 for _, ok in baseline if ok) / len(baseline)
+        if baseline_rate < self.drift_min_baseline:
+            return False
+        return self._recent_rate(label) < baseline_rate * self.drift_ratio
+
+    def summary(self):
+        stats = super().summary()
+        groups = {}
+        for group, names in self._groups.items():
+            groups[group] = {
+                "order": self.order(group, names, explore=False),
+                "strategies": {
+                    name: {
+                        **stats.get(f"{group}/{name}", {}),
+                        "expected_cost_ms": _ms(self.expected_cost(group, name)),
+                        "drifting": f"{group}/{name}" in self._drifting,
+                    }
+                    for name in names
+                },
+            }
+        return {"groups": groups, "drifting": self.drifting()}
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+strategy_stats = StrategyStats()
+
+
+def _collect_strategy_metrics():
+    families = {"drifting": [], "cost": []}
+    for group, names in list(strategy_stats._groups.items()):
+        for name in names:
+            labels = {"group": group, "strategy": name}
+            families["drifting"].append((labels, int(f"{group}/{name}" in strategy_stats._drifting)))
+            cost = strategy_stats.expected_cost(group, name)
+            if cost is not None:
+                families["cost"].append((labels, round(cost, 6)))
+    return [
+        ("scraper_strategy_drifting", "gauge", "1 while a strategy's recent hit rate has collapsed (likely markup change).",
+         families["drifting"]),
+        ("scraper_strategy_expected_cost_seconds", "gauge", "Mean attempt time divided by success rate.",
+         families["cost"]),
+    ]
+
+
+registry.register_collector(_collect_strategy_metrics)
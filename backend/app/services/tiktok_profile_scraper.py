@@ -1,119 +1,235 @@
 import sys
-import time
+import os
 import csv
 import json
-import pandas as pd
-from playwright.sync_api import sync_playwright
-from playwright_stealth import Stealth
+import asyncio
+import argparse
+import contextlib
+from app.services.browser_pool import BrowserPool
+from app.services.scrape_cache import ScrapeCache
+from app.services.scrape_engine import ScrapeEngine
+
+FIELDS = ["Video URL", "View Count", "Like Count"]
+FORMATS = ("tsv", "csv", "ndjson")
+# Times a URL waits out a rate limit / paused site before it is left for the next run
+ADMISSION_RETRIES = 5
+
 
 def scrape_tiktok_video(video_url, output_file="tiktok_data.csv"):
     """
     Scrapes view count and like count from a single TikTok video.
-    
+
     Args:
         video_url (str): The full TikTok video URL.
-        output_file (str): The path to save the CSV file.
+        output_file (str): The path to save the (tab separated) file.
+    """
+    asyncio.run(scrape_tiktok_batch([video_url], output_file, concurrency=1))
+
+
+async def scrape_tiktok_batch(urls, output_file, fmt="tsv", concurrency=8, checkpoint_file=None, headless=True):
+    """
+    Scrape many TikTok videos through one shared browser and stream each row
+    to `output_file` as soon as it finishes.
+
+    Args:
+        urls: Iterable of URLs (read lazily, so a file object works).
+        output_file (str): Where to write rows ("-" for stdout).
+        fmt (str): "tsv", "csv" or "ndjson".
+        concurrency (int): Scrapes in flight at once (pages on the shared browser).
+        checkpoint_file (str): If set, progress is saved here and a re-run with
+            the same input resumes where the previous run stopped.
+        headless (bool): Run Chromium headless.
+
+    Only `concurrency` URLs (plus a small read-ahead) are held in memory at a
+    time, however long the input is. URLs turned away by admission control
+    (rate limited, or the site is blocking us) are retried after the wait it
+    asks for; ones that never get through are left out of the output and the
+    checkpoint, so a resumed run tries them again. Returns the number of rows
+    written.
     """
-    
-    print(f"Starting scrape for {video_url}...")
-    
-    data = []
-    
-    with sync_playwright() as p:
-        # Launch Chromium in non-headless mode
-        browser = p.chromium.launch(
-            headless=False,
-            args=["--disable-blink-features=AutomationControlled"] # Basic evasion
-        )
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36" 
-        )
-        
-        page = context.new_page()
-        
-        # Apply stealth
-        stealth = Stealth()
-        stealth.apply_stealth_sync(page)
-        
+    checkpoint = Checkpoint.load(checkpoint_file)
+    resuming = checkpoint.next_line > 0 or bool(checkpoint.done_above)
+    if resuming:
+        print(f"Resuming from checkpoint {checkpoint_file} at line {checkpoint.next_line}", file=sys.stderr)
+
+    # Long batches recycle the browser so it doesn't bloat over thousands of pages
+    pool = BrowserPool(size=1, pages_per_browser=concurrency, headless=headless, max_pages=500, max_rss_mb=1500)
+    engine = ScrapeEngine(pool, concurrency=concurrency, cache=ScrapeCache(max_entries=256))
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    written = 0
+
+    async def produce():
+        lines = iter(urls)
+        line_no = 0
+        while True:
+            # Read off the event loop so a slow stdin doesn't stall scrapes
+            line = await asyncio.to_thread(next, lines, None)
+            if line is None:
+                break
+            url = line.strip()
+            if url and not url.startswith("#") and checkpoint.needs(line_no):
+                await queue.put((line_no, url))
+            else:
+                checkpoint.mark_done(line_no)
+            line_no += 1
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work(writer):
+        nonlocal written
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            line_no, url = job
+            data = await engine.scrape(url)
+            for _ in range(ADMISSION_RETRIES):
+                if not (data and data.get("retry_after")):
+                    break
+                await asyncio.sleep(data["retry_after"])
+                data = await engine.scrape(url)
+            if data and data.get("retry_after"):
+                print(f"[{line_no}] {url} -> skipped, {data['error']}", file=sys.stderr)
+                continue
+            writer.write(line_no, url, data)
+            written += 1
+            checkpoint.mark_done(line_no)
+            checkpoint.save()
+
+    # Scraper logging goes to stderr so "-o -" output stays clean
+    with RowWriter(output_file, fmt, append=resuming) as writer, contextlib.redirect_stdout(sys.stderr):
+        await pool.start()
         try:
-            print(f"Navigating to {video_url}...")
-            page.goto(video_url, timeout=60000)
-            
-            # Wait for meaningful content
-            page.wait_for_timeout(5000)
-            
-            view_count = "N/A"
-            like_count = "N/A"
-            
-            # Application State Extraction (Most reliable)
-            try:
-                # content = page.content() # If we needed full HTML
-                # Find the hydration script
-                script_handle = page.query_selector('script[id="__UNIVERSAL_DATA_FOR_REHYDRATION__"]')
-                if script_handle:
-                    json_text = script_handle.inner_text()
-                    data_json = json.loads(json_text)
-                    
-                    # Traverse JSON to find video stats
-                    # Structure usually: __DEFAULT_SCOPE__ -> webapp.video-detail -> itemInfo -> itemStruct
-                    default_scope = data_json.get("__DEFAULT_SCOPE__", {})
-                    video_detail = default_scope.get("webapp.video-detail", {})
-                    item_info = video_detail.get("itemInfo", {})
-                    item_struct = item_info.get("itemStruct", {})
-                    
-                    if item_struct:
-                        stats = item_struct.get("stats", {})
-                        view_count = stats.get("playCount", "N/A")
-                        like_count = stats.get("diggCount", "N/A")
-                        print(f"Extracted from JSON - Views: {view_count}, Likes: {like_count}")
-                    else:
-                        print("JSON found but itemStruct is empty or different structure.")
-                else:
-                    print("Hydration script not found.")
-            except Exception as json_e:
-                print(f"JSON extraction failed: {json_e}")
-
-            # Fallback to selectors if JSON failed (or if we want to double check)
-            if view_count == "N/A" or like_count == "N/A":
-                try:
-                    # Like Count
-                    like_el = page.query_selector('[data-e2e="like-count"]')
-                    if like_el:
-                        like_count = like_el.inner_text()
-                    
-                    # View Count - Try generic search if specific selector fails
-                    # Sometimes it's in a shared container with Strong tag?
-                    # Let's try looking for the number format?
-                    pass 
-                except Exception as sel_e:
-                    print(f"Selector extraction failed: {sel_e}")
-            
-            data.append({
-                "Video URL": video_url,
-                "View Count": view_count,
-                "Like Count": like_count
-            })
-                    
-        except Exception as e:
-            print(f"An error occurred during scraping: {e}")
+            await asyncio.gather(produce(), *(work(writer) for _ in range(concurrency)))
         finally:
-            print("Closing browser...")
-            browser.close()
-            
-    # Export to CSV
-    if data:
-        df = pd.DataFrame(data)
-        print("Extracted Data:")
-        print(df.head())
-        # Use tab separator for better readability/clickability
-        df.to_csv(output_file, index=False, sep='\t', quoting=csv.QUOTE_MINIMAL)
-        print(f"Data saved to {output_file}")
+            await engine.close()
+            await pool.stop()
+    checkpoint.save()
+    print(f"Wrote {written} row(s) to {output_file}", file=sys.stderr)
+    return written
+
+
+class RowWriter:
+    """Writes one scrape result per row and flushes immediately."""
+
+    def __init__(self, path, fmt="tsv", append=False):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+        self.path = path
+        self.fmt = fmt
+        self.append = append
+        self._file = None
+        self._csv = None
+
+    def __enter__(self):
+        if self.path == "-":
+            self._file = sys.stdout
+            has_rows = False
+        else:
+            has_rows = self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+            self._file = open(self.path, "a" if self.append else "w", newline="")
+        if self.fmt != "ndjson":
+            # Use tab separator for better readability/clickability
+            delimiter = "\t" if self.fmt == "tsv" else ","
+            self._csv = csv.writer(self._file, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+            if not has_rows:
+                self._csv.writerow(FIELDS)
+        return self
+
+    def write(self, line_no, url, data):
+        ok = data and "error" not in data
+        if self.fmt == "ndjson":
+            row = {"line": line_no, "video_url": url, **(data or {})}
+            self._file.write(json.dumps(row) + "\n")
+        else:
+            views = data.get("views", "N/A") if ok else "N/A"
+            likes = data.get("likes", "N/A") if ok else "N/A"
+            self._csv.writerow([url, views, likes])
+        self._file.flush()
+        status = f"Views: {data.get('views')}, Likes: {data.get('likes')}" if ok else (data or {}).get("error", "no data")
+        print(f"[{line_no}] {url} -> {status}", file=sys.stderr)
+
+    def __exit__(self, *exc):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class Checkpoint:
+    """
+    Resumable progress over input line numbers.
+    Stores the first line not yet finished plus the (few) finished lines past
+    it, so its size is bounded by the number of scrapes in flight.
+    """
+
+    def __init__(self, path=None, next_line=0, done_above=()):
+        self.path = path
+        self.next_line = next_line
+        self.done_above = set(done_above)
+
+    @classmethod
+    def load(cls, path):
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                state = json.load(f)
+            return cls(path, state.get("next_line", 0), state.get("done_above", []))
+        return cls(path)
+
+    def needs(self, line_no):
+        return line_no >= self.next_line and line_no not in self.done_above
+
+    def mark_done(self, line_no):
+        if line_no < self.next_line:
+            return
+        self.done_above.add(line_no)
+        while self.next_line in self.done_above:
+            self.done_above.remove(self.next_line)
+            self.next_line += 1
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"next_line": self.next_line, "done_above": sorted(self.done_above)}, f)
+        os.replace(tmp_path, self.path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape view/like counts for TikTok videos.")
+    parser.add_argument("urls", nargs="*", help="Video URLs (or use --input)")
+    parser.add_argument("-i", "--input", help="File with one URL per line, '-' for stdin")
+    parser.add_argument("-o", "--output", default="tiktok_data.csv", help="Output file, '-' for stdout (default: tiktok_data.csv)")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="tsv", help="Output format (default: tsv)")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Scrapes in flight at once (default: 8)")
+    parser.add_argument("--checkpoint", help="Checkpoint file; re-run with the same input to resume")
+    parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    args = parser.parse_args(argv)
+
+    if not args.urls and not args.input:
+        parser.print_usage()
+        return 1
+
+    if args.input == "-":
+        source = sys.stdin
+    elif args.input:
+        source = open(args.input, "r")
     else:
-        print("No data extracted.")
+        source = args.urls
+
+    try:
+        asyncio.run(scrape_tiktok_batch(
+            source,
+            args.output,
+            fmt=args.format,
+            concurrency=max(1, args.concurrency),
+            checkpoint_file=args.checkpoint,
+            headless=not args.headed,
+        ))
+    finally:
+        if source is not sys.stdin and hasattr(source, "close"):
+            source.close()
+    return 0
+
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        video_url = sys.argv[1]
-        scrape_tiktok_video(video_url)
-    else:
-        print("Usage: python tiktok_profile_scraper.py <video_url>")
+    sys.exit(main())
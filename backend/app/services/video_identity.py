@@ -0,0 +1,128 @@
+import asyncio
+import re
+from collections import OrderedDict
+from urllib.parse import urljoin, urlsplit
+import httpx
+from app.services.browser_pool import USER_AGENT
+
+# Full (www), mobile (m.tiktok.com/v/<id>.html) and share-query forms
+_VIDEO_ID_PATTERNS = [
+    re.compile(r"/video/(\d+)"),
+    re.compile(r"/v/(\d+)"),
+    re.compile(r"[?&](?:item_id|share_item_id)=(\d+)"),
+]
+SHORT_LINK_HOSTS = ("vm.tiktok.com", "vt.tiktok.com")
+MAX_REDIRECTS = 5
+
+INSTAGRAM_HOSTS = ("instagram.com", "instagr.am")
+_INSTAGRAM_SHORTCODE_RE = re.compile(r"/(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)")
+
+
+def extract_video_id(url):
+    """Numeric TikTok video ID from a full or mobile URL, or None."""
+    for pattern in _VIDEO_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+def platform_of(url):
+    """"instagram" for Instagram URLs, otherwise "tiktok"."""
+    host = (urlsplit(url).hostname or "").lower()
+    if any(host == h or host.endswith("." + h) for h in INSTAGRAM_HOSTS):
+        return "instagram"
+    return "tiktok"
+
+
+def extract_instagram_id(url):
+    """Asset ID for an Instagram post / reel URL ("ig_<shortcode>"), or None."""
+    match = _INSTAGRAM_SHORTCODE_RE.search(urlsplit(url).path)
+    return f"ig_{match.group(1)}" if match else None
+
+
+def is_short_link(url):
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    return host in SHORT_LINK_HOSTS or (host.endswith("tiktok.com") and parts.path.startswith("/t/"))
+
+
+def fallback_key(url):
+    """Stable key for URLs we can't get a video ID from (host + path, no query)."""
+    parts = urlsplit(url)
+    return f"{(parts.hostname or '').lower()}{parts.path.rstrip('/')}"
+
+
+class ShortLinkResolver:
+    """
+    Resolves vm.tiktok.com / vt.tiktok.com / tiktok.com/t/ short links to the
+    full video URL by following redirects (without downloading the page), and
+    caches the answer: a short link always points at the same video.
+    """
+
+    def __init__(self, max_entries=10000, timeout=10.0):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._resolved = OrderedDict()
+        self._inflight = {}
+        self._client = None
+
+    async def resolve(self, url):
+        """Return the full URL a short link redirects to (or `url` if it isn't one / fails)."""
+        if not is_short_link(url):
+            return url
+        if url in self._resolved:
+            self._resolved.move_to_end(url)
+            return self._resolved[url]
+
+        task = self._inflight.get(url)
+        if not task:
+            task = asyncio.ensure_future(self._follow(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda t: self._inflight.pop(url, None))
+        resolved = await asyncio.shield(task)
+
+        if extract_video_id(resolved):
+            self._resolved[url] = resolved
+            while len(self._resolved) > self.max_entries:
+                self._resolved.popitem(last=False)
+        return resolved
+
+    async def _follow(self, url):
+        if self._client is None:
+            self._client = httpx.AsyncClient(headers={"User-Agent": USER_AGENT}, timeout=self.timeout)
+        current = url
+        try:
+            for _ in range(MAX_REDIRECTS):
+                response = await self._client.head(current)
+                location = response.headers.get("location")
+                if not response.is_redirect or not location:
+                    break
+                current = urljoin(current, location)
+                if extract_video_id(current):
+                    break
+        except Exception as e:
+            print(f"VideoIdentity: Could not resolve short link {url}: {e}")
+            return url
+        return current
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+short_link_resolver = ShortLinkResolver()
+
+
+async def canonicalize(url):
+    """
+    Resolve `url` to (video_id, scrape_url).
+    video_id is the numeric TikTok ID, or "ig_<shortcode>" for Instagram
+    (None if it can't be determined), and scrape_url is the full URL to
+    fetch, with short links expanded.
+    """
+    if platform_of(url) == "instagram":
+        return extract_instagram_id(url), url
+    scrape_url = await short_link_resolver.resolve(url)
+    return extract_video_id(scrape_url), scrape_url
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from datetime import datetime
+from app.services.supabase_client import supabase
+from app.services import history_store
+from app.services.chart_history import chart_history
+from app.services.scrape_engine import scrape_engine
+from app.services.scrape_queue import scrape_queue, QueueScraper
+
+# "inline": scrape inside this process. "worker": hand scrapes to
+# `python -m app.services.scrape_worker` processes through the SQLite job queue.
+SCRAPER_MODE = os.getenv("SCRAPER_MODE", "inline")
+scraper = QueueScraper(
+    scrape_queue,
+    timeout=float(os.getenv("SCRAPE_JOB_TIMEOUT", "120")),
+    queue_timeout=float(os.getenv("SCRAPE_QUEUE_TIMEOUT", "1800")),
+) if SCRAPER_MODE == "worker" else scrape_engine
+
+# Keep .in_() filters (sent as URL query params) a reasonable length
+ROW_CHUNK = 200
+# Supabase returns at most this many rows per request
+PAGE_SIZE = 1000
+# Called on the event loop as fn(asset_id, views, likes, timestamp) after every saved scrape
+scrape_listeners = []
+
+
+def notify_saved(asset_id, views, likes, timestamp):
+    """Tell listeners (e.g. the refresh scheduler) about a saved scrape, whatever triggered it."""
+    for listener in scrape_listeners:
+        try:
+            listener(asset_id, views, likes, timestamp)
+        except Exception as e:
+            print(f"VideoRefresh: Scrape listener failed: {e}")
+
+
+def select_all(table, columns):
+    """Every row of `table`, paging past Supabase's per-request row limit."""
+    rows = []
+    start = 0
+    while True:
+        page = supabase.table(table).select(columns).range(start, start + PAGE_SIZE - 1).execute().data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def _load_rows(asset_ids):
+    rows = []
+    for i in range(0, len(asset_ids), ROW_CHUNK):
+        res = supabase.table("videos").select("asset_id, video_url").in_(
+            "asset_id", asset_ids[i:i + ROW_CHUNK]
+        ).execute()
+        rows.extend(res.data)
+    return rows
+
+
+def save_scrape(asset_id, data):
+    """
+    Write one scrape's views/likes/price to the videos row and append a
+    point to its history. Returns a per-asset result dict.
+    """
+    if not data or "error" in data:
+        return {"asset_id": asset_id, "success": False, "error": data.get("error", "Scrape failed") if data else "Scrape failed"}
+    try:
+        views = int(data.get("views", 0))
+        likes = int(data.get("likes", 0))
+        current_price = views / 1000
+
+        current_time = datetime.utcnow().isoformat()
+
+        history_store.append_point(asset_id, views, likes, current_time)
+        chart_history.invalidate(asset_id)
+        supabase.table("videos").update({
+            "views": views,
+            "likes": likes,
+            "current_price": current_price,
+            "last_scraped_at": current_time,
+        }).eq("asset_id", asset_id).execute()
+
+        return {"asset_id": asset_id, "success": True, "views": views, "likes": likes, "scraped_at": current_time}
+    except Exception as e:
+        return {"asset_id": asset_id, "success": False, "error": str(e)}
+
+
+async def refresh_iter(asset_ids):
+    """
+    Re-scrape assets concurrently and save each one as soon as its scrape
+    completes. Yields a result dict per asset (in completion order),
+    including {"success": False, "error": "Asset not found"} for unknown IDs.
+    """
+    asset_ids = list(dict.fromkeys(asset_ids))
+    if not asset_ids:
+        return
+    rows = await asyncio.to_thread(_load_rows, asset_ids)
+
+    asset_url_map = {v["asset_id"]: v["video_url"] for v in rows}
+
+    jobs = []
+    for aid in asset_ids:
+        if aid in asset_url_map:
+            jobs.append((aid, asset_url_map[aid]))
+        else:
+            yield {"asset_id": aid, "success": False, "error": "Asset not found"}
+
+    async for asset_id, data in scraper.scrape_many(jobs):
+        result = await asyncio.to_thread(save_scrape, asset_id, data)
+        if result["success"]:
+            notify_saved(asset_id, result["views"], result["likes"], result["scraped_at"])
+        yield result
+
+
+async def refresh_assets(asset_ids):
+    """Refresh assets and return (updated, errors) lists of per-asset results."""
+    updated = []
+    errors = []
+    async for result in refresh_iter(asset_ids):
+        (updated if result["success"] else errors).append(result)
+    return updated, errors
@@ -0,0 +1,92 @@
+import sys
+import json
+import time
+import tracemalloc
+
+from app.services.hydration import extract_video_fields, ITEM_STRUCT_PATH
+
+# Saved blob from extract_json_structure.py
+DEFAULT_BLOB = "debug_universal_data.json"
+ROUNDS = 200
+
+
+def sample_item_struct():
+    """A video itemStruct shaped like TikTok's (used when the saved blob has none)."""
+    return {
+        "id": "6862153058223193350",
+        "desc": "sample video " * 20,
+        "createTime": "1597757035",
+        "video": {
+            "id": "6862153058223193350",
+            "height": 1024,
+            "width": 576,
+            "duration": 15,
+            "cover": "https://p16-sign.tiktokcdn.com/cover.jpeg",
+            "playAddr": "https://v16-webapp.tiktok.com/play.mp4",
+            "bitrateInfo": [
+                {"Bitrate": 1000 * i, "QualityType": i, "PlayAddr": {"UrlList": ["https://v16.tiktok.com/" + "x" * 200] * 3}}
+                for i in range(8)
+            ],
+            "subtitleInfos": [{"LanguageCodeName": "en", "Url": "https://x/" + "y" * 300}] * 5,
+        },
+        "author": {"id": "1", "uniqueId": "bellapoarch", "nickname": "Bella", "signature": "s" * 200},
+        "music": {"id": "2", "title": "original sound", "authorName": "Bella", "playUrl": "https://m/" + "z" * 200},
+        "challenges": [{"id": str(i), "title": f"tag{i}", "desc": "d" * 100} for i in range(10)],
+        "stats": {"diggCount": 62000000, "shareCount": 1000000, "commentCount": 700000, "playCount": 760000000},
+        "statsV2": {"diggCount": "62000000", "playCount": "760000000"},
+    }
+
+
+def load_blob(path):
+    with open(path, "r") as f:
+        text = f.read()
+    data = json.loads(text)
+    if extract_video_fields(text) is None:
+        print(f"{path} has no video itemStruct (blocked page?); injecting a sample one.")
+        scope = data.setdefault(ITEM_STRUCT_PATH[0], {})
+        scope.setdefault(ITEM_STRUCT_PATH[1], {})[ITEM_STRUCT_PATH[2]] = {ITEM_STRUCT_PATH[3]: sample_item_struct()}
+        text = json.dumps(data, separators=(",", ":"))
+    return text
+
+
+def full_parse(text):
+    data = json.loads(text)
+    item = data["__DEFAULT_SCOPE__"]["webapp.video-detail"]["itemInfo"]["itemStruct"]
+    return item["stats"]["playCount"], item["stats"]["diggCount"], item["author"]["uniqueId"], item["video"]["cover"]
+
+
+def targeted_parse(text):
+    item = extract_video_fields(text)
+    return item["stats"]["playCount"], item["stats"]["diggCount"], item["author"]["uniqueId"], item["video"]["cover"]
+
+
+def measure(fn, text):
+    fn(text)  # warm up regex caches
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        result = fn(text)
+    cpu_ms = (time.process_time() - start) * 1000 / ROUNDS
+
+    tracemalloc.start()
+    fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, cpu_ms, peak
+
+
+def bench(path):
+    text = load_blob(path)
+    print(f"Blob size: {len(text) / 1000:.0f}KB, {ROUNDS} rounds each\n")
+
+    full_result, full_cpu, full_peak = measure(full_parse, text)
+    targeted_result, targeted_cpu, targeted_peak = measure(targeted_parse, text)
+    assert full_result == targeted_result, (full_result, targeted_result)
+
+    print(f"{'parser':<10} {'cpu ms/parse':>14} {'peak alloc KB':>15}")
+    print(f"{'json.loads':<10} {full_cpu:>14.3f} {full_peak / 1000:>15.1f}")
+    print(f"{'targeted':<10} {targeted_cpu:>14.3f} {targeted_peak / 1000:>15.1f}")
+    print(f"\nCPU: {full_cpu / targeted_cpu:.1f}x faster, allocations: {full_peak / max(targeted_peak, 1):.1f}x smaller")
+
+
+if __name__ == "__main__":
+    bench(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BLOB)
@@ -0,0 +1,228 @@
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import contextlib
+import tracemalloc
+
+from bench_hydration import sample_item_struct
+from replay_server import ReplayServer
+from app.services.admission import ScrapeAdmission
+from app.services.browser_pool import BrowserPool
+from app.services.hydration import extract_video_fields
+from app.services.http_extractor import extract_from_html
+from app.services.scrape_cache import ScrapeCache
+from app.services.scrape_engine import ScrapeEngine
+from app.services.scraper import (
+    parse_hydration_json,
+    scrape_tiktok_page,
+    _extract_from_json,
+    _extract_from_selectors,
+)
+from app.services.stats import percentile
+
+# Saved page from dump_html.py
+DEFAULT_FIXTURE = "debug_page.html"
+REHYDRATION_RE = re.compile(
+    r'(<script[^>]*id="__UNIVERSAL_DATA_FOR_REHYDRATION__"[^>]*>)(.*?)(</script>)', re.DOTALL
+)
+COUNT_ELEMENTS = (
+    '<strong data-e2e="like-count">62M</strong>'
+    '<strong data-e2e="video-play-count">760M</strong>'
+)
+
+
+def build_fixture(path):
+    """
+    Load a saved page and make sure it has what both extractors look for.
+    Pages saved while TikTok was blocking us have neither a video itemStruct
+    nor count elements, so a sample of each is injected.
+    """
+    with open(path, "r") as f:
+        html = f.read()
+
+    match = REHYDRATION_RE.search(html)
+    if match and extract_video_fields(match.group(2)) is None:
+        data = json.loads(match.group(2))
+        scope = data.setdefault("__DEFAULT_SCOPE__", {})
+        scope["webapp.video-detail"] = {"itemInfo": {"itemStruct": sample_item_struct()}}
+        blob = json.dumps(data, separators=(",", ":"))
+        html = html[:match.start(2)] + blob + html[match.end(2):]
+        print(f"{path}: injected a sample itemStruct")
+    if 'data-e2e="like-count"' not in html:
+        html = html.replace("</body>", COUNT_ELEMENTS + "</body>", 1)
+        print(f"{path}: injected sample count elements")
+
+    blob = REHYDRATION_RE.search(html).group(2)
+    return html, blob
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the scraper's per-call prints while measuring."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def peak_rss_mb():
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1_000_000
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 1_000_000
+    return self_rss, child_rss
+
+
+def report(name, samples_s, cpu_s=None, peak_bytes=None):
+    samples = sorted(samples_s)
+    line = (f"{name:<32} n={len(samples):<5} p50={percentile(samples, 0.50) * 1000:8.2f}ms "
+            f"p95={percentile(samples, 0.95) * 1000:8.2f}ms")
+    if cpu_s is not None:
+        line += f" cpu/op={cpu_s / len(samples) * 1000:7.3f}ms"
+    if peak_bytes is not None:
+        line += f" peak_alloc={peak_bytes / 1000:8.1f}KB"
+    print(line)
+
+
+# ---- Extraction CPU (no browser) ----
+
+def bench_extraction_cpu(html, blob, rounds):
+    for name, fn, arg in [
+        ("parse_hydration_json(blob)", parse_hydration_json, blob),
+        ("extract_from_html(html)", extract_from_html, html),
+    ]:
+        with quiet():
+            assert fn(arg), f"{name} found no video in the fixture"
+            samples = []
+            cpu_start = time.process_time()
+            for _ in range(rounds):
+                start = time.perf_counter()
+                fn(arg)
+                samples.append(time.perf_counter() - start)
+            cpu = time.process_time() - cpu_start
+            tracemalloc.start()
+            fn(arg)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        report(name, samples, cpu, peak)
+
+
+# ---- Browser-based benchmarks ----
+
+async def offline(page):
+    """Abort everything that isn't the local replay server."""
+    async def _route(route):
+        host = route.request.url.split("/")[2] if "://" in route.request.url else ""
+        if host.startswith("127.0.0.1") or host.startswith("localhost"):
+            await route.continue_()
+        else:
+            await route.abort()
+    await page.route("**/*", _route)
+
+
+async def offline_scrape(page, url):
+    await offline(page)
+    return await scrape_tiktok_page(page, url)
+
+
+async def bench_page_extractors(pool, server, rounds):
+    async with pool.lease() as page:
+        await offline(page)
+        await page.goto(server.video_url("1"), wait_until="domcontentloaded")
+        for name, fn in [("_extract_from_json(page)", _extract_from_json), ("_extract_from_selectors(page)", _extract_from_selectors)]:
+            with quiet():
+                assert await fn(page), f"{name} found no video in the fixture"
+                samples = []
+                cpu_start = time.process_time()
+                for _ in range(rounds):
+                    start = time.perf_counter()
+                    await fn(page)
+                    samples.append(time.perf_counter() - start)
+                cpu = time.process_time() - cpu_start
+            report(name, samples, cpu)
+
+
+async def bench_end_to_end(name, scrape, server, scrapes, concurrency):
+    """Scrape `scrapes` distinct replayed videos, `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+    failures = 0
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            result = await scrape(server.video_url(7000000000000000000 + i))
+            samples.append(time.perf_counter() - start)
+            if not result or "error" in result:
+                failures += 1
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    with quiet():
+        await asyncio.gather(*(one(i) for i in range(scrapes)))
+    wall = time.perf_counter() - wall_start
+    report(name, samples, time.process_time() - cpu_start)
+    print(f"{'':<32} throughput={scrapes / wall:.1f} scrapes/s, failures={failures}")
+
+
+async def run(args):
+    html, blob = build_fixture(args.fixture)
+
+    print(f"\n== Extraction CPU ({args.rounds} rounds) ==")
+    bench_extraction_cpu(html, blob, args.rounds)
+
+    with ReplayServer() as server:
+        server.add_page(html)
+        print(f"\nReplaying fixture at {server.base_url}")
+
+        print(f"\n== End-to-end, HTTP tier ({args.scrapes} scrapes, concurrency {args.concurrency}) ==")
+        http_engine = ScrapeEngine(
+            BrowserPool(size=1), concurrency=args.concurrency, cache=ScrapeCache(ttl=0),
+            admission=ScrapeAdmission(rate=0), extractors=("http",),
+        )
+        await bench_end_to_end("engine.scrape (http tier)", http_engine.scrape, server, args.scrapes, args.concurrency)
+        await http_engine.close()
+
+        if args.no_browser:
+            print("\nSkipping browser benchmarks (--no-browser)")
+        else:
+            pool = BrowserPool(size=1, pages_per_browser=args.concurrency)
+            try:
+                with quiet():
+                    await pool.start()
+            except Exception as e:
+                print(f"\nSkipping browser benchmarks, could not launch Chromium: {e}")
+            else:
+                try:
+                    print(f"\n== Page extractors ({args.rounds} rounds) ==")
+                    await bench_page_extractors(pool, server, args.rounds)
+
+                    print(f"\n== End-to-end, Playwright ({args.scrapes} scrapes, concurrency {args.concurrency}) ==")
+                    engine = ScrapeEngine(
+                        pool, concurrency=args.concurrency, http_fast_path=False,
+                        cache=ScrapeCache(ttl=0), admission=ScrapeAdmission(rate=0),
+                    )
+                    await bench_end_to_end(
+                        "engine.scrape_page (playwright)",
+                        lambda url: engine.scrape_page(url, offline_scrape, "tiktok"),
+                        server, args.scrapes, args.concurrency,
+                    )
+                finally:
+                    with quiet():
+                        await pool.stop()
+
+    self_rss, child_rss = peak_rss_mb()
+    print(f"\nPeak RSS: python {self_rss:.0f}MB, browser processes {child_rss:.0f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks against a replayed fixture.")
+    parser.add_argument("fixture", nargs="?", default=DEFAULT_FIXTURE, help="Saved page to replay (default: debug_page.html)")
+    parser.add_argument("--rounds", type=int, default=200, help="Iterations for extraction benchmarks")
+    parser.add_argument("--scrapes", type=int, default=50, help="Scrapes for end-to-end benchmarks")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--no-browser", action="store_true", help="Only run benchmarks that don't need Chromium")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,24 @@
+
+import sys
+import json
+
+from app.services.http_extractor import extract_from_html
+
+# Saved page from dump_html.py
+DEFAULT_FIXTURE = "debug_page.html"
+
+def check(path):
+    """Run the browserless HTML extractor against a saved page (no network)."""
+    with open(path, "r") as f:
+        html = f.read()
+
+    print(f"Parsing {path} ({len(html)} bytes)...")
+    result = extract_from_html(html)
+    if result:
+        print("Success!")
+        print(json.dumps(result, indent=2))
+    else:
+        print("No video data found (page may be a block/captcha page).")
+
+if __name__ == "__main__":
+    check(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FIXTURE)
@@ -4,6 +4,8 @@ import json
 from playwright.sync_api import sync_playwright
 from playwright_stealth import Stealth
 
+from app.services.hydration import extract_video_fields
+
 TEST_URL = "https://www.tiktok.com/@bellapoarch/video/6862153058223193350"
 
 def dump_json_structure():
@@ -28,6 +30,7 @@ def dump_json_structure():
             with open("debug_universal_data.json", "w") as f:
                 f.write(content)
             print("Saved to debug_universal_data.json")
+            print(f"Scraper fields: {extract_video_fields(content)}")
         else:
             print("__UNIVERSAL_DATA_FOR_REHYDRATION__ not found")
 
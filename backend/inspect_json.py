@@ -1,10 +1,13 @@
 
 import json
 
+from app.services.hydration import extract_video_fields
+
 def inspect():
     try:
         with open("debug_universal_data.json", "r") as f:
-            data = json.load(f)
+            text = f.read()
+        data = json.loads(text)
         
         print("Top level keys:", list(data.keys()))
         
@@ -18,6 +21,10 @@ def inspect():
                 if "video" in key.lower():
                     print(f"\nPotential match: {key}")
                     print(json.dumps(scope[key], indent=2)[:500]) # Print start of content
+
+        # What the scraper would actually pull out of this blob
+        print("\nTargeted extraction (stats / author / video.cover):")
+        print(json.dumps(extract_video_fields(text), indent=2))
                     
     except Exception as e:
         print(f"Error: {e}")
@@ -1,23 +1,67 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, HttpUrl
 from typing import Optional, List
 import os
+import asyncio
 import hashlib
+import json
 import random
 import string
 import uuid
 from datetime import datetime
 import math
 import pytz
+from contextlib import asynccontextmanager
 from app.services.supabase_client import supabase
-from app.services.scraper import get_tiktok_data
+from app.services import history_store
+from app.services.chart_history import chart_history, RANGES as CHART_RANGES, MAX_POINTS_LIMIT
+from app.services.series_codec import encode_series, wants_msgpack, pack, MSGPACK_TYPE
+from app.services.browser_pool import browser_pool
+from app.services.scrape_engine import scrape_engine
+from app.services.scrape_queue import scrape_queue
+from app.services.video_refresh import SCRAPER_MODE, scraper, refresh_assets, notify_saved
+from app.services.refresh_scheduler import refresh_scheduler
+from app.services.refresh_jobs import refresh_jobs
+from app.services.history_retention import history_compactor
+from app.services.readiness import readiness_stats
+from app.services.request_policy import traffic_stats
+from app.services.strategy_stats import strategy_stats
+from app.services.metrics import registry as metrics_registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SCRAPER_MODE == "worker":
+        print(f"Scraper: Using scrape workers via {scrape_queue.path}")
+    else:
+        # Warm the scraper browsers once so each scrape is just a page navigation
+        try:
+            await browser_pool.start()
+        except Exception as e:
+            print(f"BrowserPool: Failed to start, scrapes will launch their own browser: {e}")
+    if os.getenv("REFRESH_SCHEDULER", "1") != "0":
+        refresh_scheduler.start()
+    if os.getenv("HISTORY_COMPACTION", "1") != "0":
+        history_compactor.start()
+    yield
+    await refresh_scheduler.stop()
+    await history_compactor.stop()
+    await refresh_jobs.stop()
+    if SCRAPER_MODE == "worker":
+        await scraper.close()
+    else:
+        await scrape_engine.close()
+        await browser_pool.stop()
+
 
 # Initialize FastAPI
 app = FastAPI(
     title="Viral Market API",
     description="Social media fantasy stock market backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS - Allow frontend to connect
@@ -86,6 +130,7 @@ class PortfolioItem(BaseModel):
     thumbnail: str = ""
     view_history: Optional[List[dict]] = None
     like_history: Optional[List[dict]] = None
+    history: Optional[dict] = None  # format=compact: columnar view/like history (app/services/series_codec.py)
 
 class PortfolioResponse(BaseModel):
     user_id: str
@@ -228,14 +273,14 @@ def calculate_valuation(cost_basis: float, buy_tier: float, current_views: int,
         return cost_basis
 
 @app.post("/api/scrape", response_model=ScrapeResponse)
-def scrape_video(request: ScrapeRequest):
+async def scrape_video(request: ScrapeRequest):
     """
-    Scrape a TikTok video and save to Supabase
+    Scrape a TikTok or Instagram video and save to Supabase
     """
     video_url = str(request.video_url)
     
     try:
-        data = get_tiktok_data(video_url)
+        data = await scraper.scrape(video_url)
         
         if not data or "error" in data:
             error_msg = data.get("error", "Unknown scraping error") if data else "Scraper returned None"
@@ -258,38 +303,31 @@ def scrape_video(request: ScrapeRequest):
         views = parse_count(views_raw)
         likes = parse_count(likes_raw)
         current_price = views / 1000
-        asset_id = f"asset_{author}_{views}"
+        # Key assets by the numeric TikTok video ID so re-scrapes hit the same row
+        asset_id = data.get("video_id") or f"asset_{author}_{views}"
 
         thumbnail = data.get("thumbnail", "")
         current_time = datetime.utcnow().isoformat()
 
         # ✅ Save to Supabase (Upsert in case it was already scraped)
-        # We fetch existing history first to avoid overwriting it if the video was already scraped
-        existing_res = supabase.table("videos").select("view_history, like_history").eq("asset_id", asset_id).execute()
-        
-        if existing_res.data and existing_res.data[0].get("view_history"):
-            # Update existing totals but keep/append history if we wanted to (though scrape is usually for new videos)
-            # For scrape_video, if it exists, we might just want to update current stats.
-            # But the user said "when the video is scraped, info is added to history".
-            # If it already exists, let's append to be safe, or just initialize if empty.
-            hist = existing_res.data[0]
-            view_hist = (hist.get("view_history") or []) + [{"count": views, "timestamp": current_time}]
-            like_hist = (hist.get("like_history") or []) + [{"count": likes, "timestamp": current_time}]
-        else:
-            view_hist = [{"count": views, "timestamp": current_time}]
-            like_hist = [{"count": likes, "timestamp": current_time}]
-
-        supabase.table("videos").upsert({
-            "asset_id": asset_id,
-            "video_url": video_url,
-            "author": author,
-            "views": views,
-            "likes": likes,
-            "current_price": current_price,
-            "thumbnail": thumbnail,
-            "view_history": view_hist,
-            "like_history": like_hist
-        }).execute()
+        def save():
+            supabase.table("videos").upsert({
+                "asset_id": asset_id,
+                "video_url": video_url,
+                "author": author,
+                "views": views,
+                "likes": likes,
+                "current_price": current_price,
+                "thumbnail": thumbnail,
+                "last_scraped_at": current_time
+            }).execute()
+            # Every scrape adds a point to the video's history (after the upsert, which creates the row)
+            history_store.append_point(asset_id, views, likes, current_time)
+            chart_history.invalidate(asset_id)
+
+        # Blocking Supabase calls stay off the event loop the scrape engine runs on
+        await asyncio.to_thread(save)
+        notify_saved(asset_id, views, likes, current_time)
         
         return ScrapeResponse(
             success=True,
@@ -322,7 +360,7 @@ async def create_investment(request: InvestRequest):
             user_balance = user_res.data[0]["balance"]
             
         # Get asset
-        asset_res = supabase.table("videos").select("*").eq("asset_id", request.asset_id).execute()
+        asset_res = supabase.table("videos").select("asset_id, current_price, views, likes").eq("asset_id", request.asset_id).execute()
         if not asset_res.data:
             raise HTTPException(status_code=404, detail="Asset not found. Please Search/Scrape first.")
             
@@ -379,11 +417,44 @@ async def create_investment(request: InvestRequest):
         return InvestResponse(success=False, error=str(e))
 
 
+# Chart points per asset in portfolio responses
+PORTFOLIO_CHART_POINTS = int(os.getenv("PORTFOLIO_CHART_POINTS", "100"))
+
+SERIES_FORMATS = ("points", "compact")
+
+def _check_series_format(series_format):
+    if series_format not in SERIES_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(SERIES_FORMATS)}")
+
+def _series_response(body, request, headers=None):
+    """Send a history-heavy body as MessagePack when the client accepts it and msgpack is installed, else JSON."""
+    if wants_msgpack(request.headers.get("accept")):
+        return Response(pack(body), media_type=MSGPACK_TYPE, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+def _check_chart_params(chart_range, max_points):
+    if chart_range not in CHART_RANGES:
+        raise HTTPException(status_code=400, detail=f"range must be one of: {', '.join(CHART_RANGES)}")
+    if not 3 <= max_points <= MAX_POINTS_LIMIT:
+        raise HTTPException(status_code=400, detail=f"max_points must be between 3 and {MAX_POINTS_LIMIT}")
+
 @app.get("/api/portfolio/{user_id}", response_model=PortfolioResponse)
-async def get_portfolio(user_id: str):
+async def get_portfolio(user_id: str, request: Request, chart_range: str = "all",
+                        chart_points: int = PORTFOLIO_CHART_POINTS, include_history: bool = True,
+                        series_format: str = Query("points", alias="format")):
     """
-    Get user's portfolio with all investments and P/L
+    Get user's portfolio with all investments and P/L.
+    Each item's view/like history covers `chart_range` and is downsampled
+    (LTTB) to at most `chart_points` points; see /api/assets/{asset_id}/chart.
+    With include_history=false the history fields are null: clients polling
+    prices fetch history deltas from /api/assets/{asset_id}/history instead.
+    format=compact puts each item's history in `history` as delta-encoded
+    columns instead of view_history / like_history point lists; add
+    `Accept: application/x-msgpack` to get the response as MessagePack.
     """
+    _check_chart_params(chart_range, chart_points)
+    _check_series_format(series_format)
+    compact = series_format == "compact"
     print(f"\n--- Fetching portfolio for user: {user_id} ---")
     try:
         # Get user balance
@@ -406,11 +477,19 @@ async def get_portfolio(user_id: str):
         asset_ids = [inv["asset_id"] for inv in user_investments]
         print(f"3. Fetching current prices for {len(asset_ids)} assets from 'videos' table...")
         videos_map = {}
+        history_map = {}
         if asset_ids:
-            vid_res = supabase.table("videos").select("*").in_("asset_id", asset_ids).execute()
+            vid_res = supabase.table("videos").select(
+                "asset_id, video_url, author, current_price, views, likes, thumbnail"
+            ).in_("asset_id", asset_ids).execute()
             for v in vid_res.data:
                 videos_map[v["asset_id"]] = v
             print(f"   -> Successfully retrieved data for {len(vid_res.data)} assets")
+            if include_history:
+                history_map = await asyncio.to_thread(
+                    chart_history.get_many, list(videos_map), chart_range, chart_points
+                )
+                print(f"   -> Retrieved chart history for {len(history_map)} assets")
         else:
             print("   -> No assets to fetch")
         
@@ -432,8 +511,9 @@ async def get_portfolio(user_id: str):
             views = asset_info.get("views", 0) if asset_info else 0
             likes = asset_info.get("likes", 0) if asset_info else 0
             thumbnail = asset_info.get("thumbnail", "") if asset_info else ""
-            view_history = asset_info.get("view_history", []) if asset_info else []
-            like_history = asset_info.get("like_history", []) if asset_info else []
+            history = history_map.get(asset_id, {}) if include_history else {}
+            view_history = history.get("view_history", []) if include_history else None
+            like_history = history.get("like_history", []) if include_history else None
 
             # Use High-Frequency Formula
             curr_val = calculate_valuation(
@@ -498,15 +578,16 @@ async def get_portfolio(user_id: str):
                 views_at_purchase=agg["views_at_purchase"],
                 likes_at_purchase=agg["likes_at_purchase"],
                 thumbnail=agg["thumbnail"],
-                view_history=agg["view_history"],
-                like_history=agg["like_history"]
+                view_history=None if compact else agg["view_history"],
+                like_history=None if compact else agg["like_history"],
+                history=encode_series(agg["view_history"], agg["like_history"]) if compact and include_history else None
             )
             portfolio_items.append(item)
             
         print(f"5. Done! Total value: {total_value}, Total invested: {total_invested}")
         print("--------------------------------------------------\n")
             
-        return PortfolioResponse(
+        response = PortfolioResponse(
             user_id=user_id,
             balance=balance,
             total_invested=total_invested,
@@ -514,6 +595,9 @@ async def get_portfolio(user_id: str):
             total_profit_loss=total_value - total_invested,
             investments=portfolio_items
         )
+        if compact or wants_msgpack(request.headers.get("accept")):
+            return _series_response(response.model_dump(), request)
+        return response
         
     except Exception as e:
         print(f"ERROR getting portfolio for {user_id}: {str(e)}")
@@ -618,82 +702,216 @@ class RefreshRequest(BaseModel):
     asset_ids: List[str]
 
 @app.post("/api/videos/refresh")
-def refresh_videos(request: RefreshRequest):
+async def refresh_videos(request: RefreshRequest):
     """
     Re-scrape each video and update views/likes/price in Supabase.
-    Maintains historical JSON logs for charts.
-    Runs scrapes in parallel to minimize total wait time.
+    Appends a point to each video's history (video_history table) for charts.
+    Scrapes run concurrently on the async scrape engine; each video is saved
+    as soon as its scrape completes (see app/services/video_refresh.py).
     """
-    if not request.asset_ids:
-        return {"success": True, "updated": [], "errors": []}
+    updated, errors = await refresh_assets(request.asset_ids)
+    return {"success": True, "updated": updated, "errors": errors}
 
-    vid_res = supabase.table("videos").select(
-        "asset_id, video_url, view_history, like_history"
-    ).in_("asset_id", request.asset_ids).execute()
-    
-    asset_url_map = {v["asset_id"]: v["video_url"] for v in vid_res.data}
-    asset_history_map = {
-        v["asset_id"]: {
-            "view_history": v.get("view_history") or [],
-            "like_history": v.get("like_history") or []
-        } for v in vid_res.data
+@app.get("/api/scraper/stats")
+async def get_scraper_stats():
+    """
+    Scraper health: how long pages take to hydrate (p50/p95) per site and
+    the success rate / latency of each extraction tier (http, ytdlp, playwright),
+    plus bytes transferred and requests blocked per scrape, scrape-cache
+    hit / miss / coalesce counters, per-host rate limit / circuit breaker state,
+    each extraction strategy's expected cost, current order and drift flag,
+    and each pooled browser's memory, page count and recycle history.
+    In worker mode these describe this process only; see "queue" for the workers' backlog.
+    "scheduler" shows the background refresher's budget and what it will refresh next,
+    "refresh_jobs" the bulk refresh jobs started through /api/assets/refresh,
+    "history_retention" how much history has been rolled into hourly / daily buckets.
+    """
+    stats = {
+        "mode": SCRAPER_MODE,
+        "readiness": readiness_stats.summary(),
+        "tiers": scrape_engine.tier_stats.summary(),
+        "traffic": traffic_stats.summary(),
+        "cache": scrape_engine.cache.summary(),
+        "admission": scrape_engine.admission.summary(),
+        "strategies": strategy_stats.summary(),
+        "browsers": browser_pool.summary(),
+        "scheduler": refresh_scheduler.summary(),
+        "refresh_jobs": refresh_jobs.summary(),
+        "history_retention": history_compactor.summary()
     }
+    if SCRAPER_MODE == "worker":
+        stats["queue"] = await asyncio.to_thread(scrape_queue.summary)
+    return stats
 
-    def scrape_and_update(asset_id: str):
-        video_url = asset_url_map.get(asset_id)
-        if not video_url:
-            return {"asset_id": asset_id, "success": False, "error": "Asset not found"}
-        try:
-            data = get_tiktok_data(video_url)
-            if not data or "error" in data:
-                return {"asset_id": asset_id, "success": False, "error": data.get("error", "Scrape failed")}
+class ScrapeJobsRequest(BaseModel):
+    video_urls: List[HttpUrl]
 
-            views = int(data.get("views", 0))
-            likes = int(data.get("likes", 0))
-            current_price = views / 1000
+@app.post("/api/scrape/jobs")
+async def submit_scrape_jobs(request: ScrapeJobsRequest):
+    """
+    Queue scrapes for the worker processes and return their job IDs straight
+    away; poll GET /api/scrape/jobs/{job_id} for results. Scrape-only: nothing
+    is saved to the videos table.
+    """
+    if SCRAPER_MODE != "worker":
+        raise HTTPException(status_code=409, detail="Scrape workers are not enabled (set SCRAPER_MODE=worker)")
+    job_ids = await scraper.submit(str(url) for url in request.video_urls)
+    return {"success": True, "job_ids": job_ids}
+
+@app.get("/api/scrape/jobs/{job_id}")
+async def get_scrape_job(job_id: int):
+    """Status (queued / running / done / failed) and, once finished, the result of a scrape job."""
+    job = await asyncio.to_thread(scrape_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/assets/{asset_id}/chart")
+async def get_asset_chart(asset_id: str, request: Request, chart_range: str = Query("all", alias="range"),
+                          max_points: int = 200, start: Optional[str] = None, end: Optional[str] = None,
+                          series_format: str = Query("points", alias="format")):
+    """
+    View/like history for charts, downsampled with Largest-Triangle-Three-Buckets
+    to at most `max_points` points. `range` is one of 1d / 7d / 30d / 90d / all;
+    `start` / `end` (ISO timestamps) pick an explicit window instead.
+    Results are cached per (asset, range, max_points) until the asset is re-scraped.
+    format=compact / Accept: application/x-msgpack as for the portfolio.
+    """
+    _check_chart_params(chart_range, max_points)
+    _check_series_format(series_format)
+    start = _parse_since(start, "start")
+    end = _parse_since(end, "end")
+    series = await asyncio.to_thread(chart_history.get, asset_id, chart_range, max_points, start, end)
+    body = {"asset_id": asset_id, "range": chart_range if not (start or end) else None,
+            "max_points": max_points, "points": len(series["view_history"])}
+    if series_format == "compact":
+        body["history"] = encode_series(series["view_history"], series["like_history"])
+    else:
+        body.update(series)
+    return _series_response(body, request)
+
+def _parse_since(value, name="since"):
+    """
+    Validate an ISO-8601 timestamp query parameter and normalize it to the
+    naive-UTC form history is stored in; 400 if it isn't one.
+    """
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO-8601 timestamp")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(pytz.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" match
+    return "*" in tags or any(t.removeprefix("W/") == etag.removeprefix("W/") for t in tags)
+
+@app.get("/api/assets/{asset_id}/history")
+async def get_asset_history(asset_id: str, request: Request, since: Optional[str] = None,
+                            series_format: str = Query("points", alias="format")):
+    """
+    View/like history points newer than `since` (an ISO timestamp, normally
+    the `cursor` from the previous response), so polling clients only get
+    deltas. Full resolution; older points come back as hourly / daily
+    rollups. Carries an ETag that changes whenever the asset is re-scraped:
+    send it back as If-None-Match to get a 304 with no body.
+    format=compact / Accept: application/x-msgpack as for the portfolio.
+    """
+    _check_series_format(series_format)
+    since = _parse_since(since)
+    res = await asyncio.to_thread(
+        lambda: supabase.table("videos").select("asset_id, last_scraped_at").eq("asset_id", asset_id).execute()
+    )
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    version = res.data[0].get("last_scraped_at") or ""
+    encoding = f"{series_format}|{wants_msgpack(request.headers.get('accept'))}"
+    etag = 'W/"' + hashlib.sha1(f"{asset_id}|{since or ''}|{version}|{encoding}".encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    history = (await asyncio.to_thread(history_store.read_history, [asset_id], since))[asset_id]
+    points = history["view_history"]
+    body = {
+        "asset_id": asset_id,
+        "since": since,
+        # Pass this as `since` next time
+        "cursor": points[-1]["timestamp"] if points else since,
+    }
+    if series_format == "compact":
+        body["history"] = encode_series(history["view_history"], history["like_history"])
+    else:
+        body.update(history)
+    return _series_response(body, request, headers)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus text-format metrics: per-phase and per-strategy scrape
+    latency histograms (with success/failure labels), cache and traffic counters.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
-            current_time = datetime.utcnow().isoformat()
+class AssetRefreshRequest(BaseModel):
+    asset_ids: Optional[List[str]] = None  # Default: every asset
+    held_only: bool = False  # Only assets someone has invested in
+    platform: Optional[str] = None  # "tiktok" or "instagram"
 
-            history = asset_history_map.get(asset_id, {"view_history": [], "like_history": []})
-            new_view_record = {"count": views, "timestamp": current_time}
-            new_like_record = {"count": likes, "timestamp": current_time}
-            
-            updated_view_history = history["view_history"] + [new_view_record]
-            updated_like_history = history["like_history"] + [new_like_record]
+@app.post("/api/assets/refresh", status_code=202)
+async def refresh_asset_prices(request: Optional[AssetRefreshRequest] = None):
+    """
+    Start a background refresh of all assets (or the filtered set) and return
+    its job ID straight away. Poll GET /api/assets/refresh/{job_id} for
+    progress, or stream per-asset results from .../{job_id}/results.
+    """
+    request = request or AssetRefreshRequest()
+    if request.platform not in (None, "tiktok", "instagram"):
+        raise HTTPException(status_code=400, detail="platform must be 'tiktok' or 'instagram'")
+    try:
+        job = await refresh_jobs.start(request.asset_ids, request.held_only, request.platform)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"success": True, "job_id": job.job_id, "total": len(job.asset_ids)}
 
-            supabase.table("videos").update({
-                "views": views,
-                "likes": likes,
-                "current_price": current_price,
-                "view_history": updated_view_history,
-                "like_history": updated_like_history,
-            }).eq("asset_id", asset_id).execute()
+def _refresh_job(job_id):
+    job = refresh_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-            return {"asset_id": asset_id, "success": True}
-        except Exception as e:
-            return {"asset_id": asset_id, "success": False, "error": str(e)}
-
-    updated = []
-    errors = []
-
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = {executor.submit(scrape_and_update, aid): aid for aid in request.asset_ids}
-        for future in as_completed(futures):
-            result = future.result()
-            if result["success"]:
-                updated.append(result)
-            else:
-                errors.append(result)
+@app.get("/api/assets/refresh/{job_id}")
+async def get_asset_refresh(job_id: str):
+    """Status (running / done / failed / cancelled), progress, throughput, ETA and per-asset errors."""
+    return _refresh_job(job_id).summary()
 
-    return {"success": True, "updated": updated, "errors": errors}
+@app.get("/api/assets/refresh/{job_id}/results")
+async def stream_asset_refresh(job_id: str, offset: int = 0):
+    """
+    Per-asset results as NDJSON, one line per asset as soon as it is saved,
+    until the job finishes. Pass `offset` (lines already read) to resume.
+    """
+    job = _refresh_job(job_id)
 
-@app.post("/api/assets/refresh")
-async def refresh_asset_prices():
-    try:
-        return {"success": True, "message": "Price refresh endpoint - TODO: Implement", "assets_updated": 0}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    async def lines():
+        async for result in job.stream(offset):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.delete("/api/assets/refresh/{job_id}")
+async def cancel_asset_refresh(job_id: str):
+    """Stop a running refresh; assets already saved stay updated."""
+    job = await refresh_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.summary(errors=False)
 
 
 @app.get("/api/leaderboard")
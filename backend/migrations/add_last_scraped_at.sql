@@ -0,0 +1,19 @@
+-- Track when each video was last scraped, for the background refresh scheduler
+-- (app/services/refresh_scheduler.py). Existing rows are backfilled from the
+-- newest view_history point, or created_at if they have no history.
+-- Run this in your Supabase SQL Editor.
+
+ALTER TABLE videos
+ADD COLUMN IF NOT EXISTS last_scraped_at TIMESTAMP WITH TIME ZONE;
+
+UPDATE videos v
+SET last_scraped_at = COALESCE(
+    (
+        SELECT MAX((p.point->>'timestamp')::timestamp AT TIME ZONE 'UTC')
+        FROM jsonb_array_elements(COALESCE(v.view_history::jsonb, '[]'::jsonb)) AS p(point)
+    ),
+    v.created_at
+)
+WHERE v.last_scraped_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS videos_last_scraped_at_idx ON videos (last_scraped_at);
@@ -0,0 +1,40 @@
+-- Append-only view / like history (app/services/history_store.py): one row per
+-- scrape instead of rewriting the view_history / like_history JSON arrays on
+-- every refresh. Existing array points are backfilled; view and like points
+-- written by the same scrape share a timestamp and become one row.
+-- Run this in your Supabase SQL Editor.
+
+CREATE TABLE IF NOT EXISTS video_history (
+    id BIGSERIAL PRIMARY KEY,
+    asset_id TEXT NOT NULL REFERENCES videos (asset_id) ON DELETE CASCADE,
+    "timestamp" TIMESTAMP NOT NULL,
+    views BIGINT NOT NULL DEFAULT 0,
+    likes BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS video_history_asset_timestamp_idx ON video_history (asset_id, "timestamp");
+
+-- Backfill (skipped for assets that already have rows, so re-running is safe)
+INSERT INTO video_history (asset_id, "timestamp", views, likes)
+SELECT
+    COALESCE(vp.asset_id, lp.asset_id),
+    COALESCE(vp.ts, lp.ts),
+    COALESCE(vp.count, 0),
+    COALESCE(lp.count, 0)
+FROM (
+    SELECT v.asset_id, (p.point->>'timestamp')::timestamp AS ts, MAX((p.point->>'count')::bigint) AS count
+    FROM videos v, jsonb_array_elements(COALESCE(v.view_history::jsonb, '[]'::jsonb)) AS p(point)
+    GROUP BY 1, 2
+) vp
+FULL OUTER JOIN (
+    SELECT v.asset_id, (p.point->>'timestamp')::timestamp AS ts, MAX((p.point->>'count')::bigint) AS count
+    FROM videos v, jsonb_array_elements(COALESCE(v.like_history::jsonb, '[]'::jsonb)) AS p(point)
+    GROUP BY 1, 2
+) lp ON lp.asset_id = vp.asset_id AND lp.ts = vp.ts
+WHERE NOT EXISTS (
+    SELECT 1 FROM video_history h WHERE h.asset_id = COALESCE(vp.asset_id, lp.asset_id)
+);
+
+-- The API no longer reads or writes the JSON arrays. Once you have checked the
+-- backfill, free their space with:
+-- UPDATE videos SET view_history = '[]', like_history = '[]';
@@ -0,0 +1,86 @@
+-- Merge duplicate videos rows into one row per TikTok video
+-- Assets used to be keyed asset_<author>_<views>, so every re-scrape after the
+-- view count changed created a new row. New scrapes key assets by the numeric
+-- TikTok video ID; this re-keys existing rows the same way, merges their
+-- view/like history, and points investments at the merged row.
+-- Run this in your Supabase SQL Editor.
+
+BEGIN;
+
+-- 1. Numeric video ID for every row whose URL has one (short links are left alone)
+CREATE TEMP TABLE video_ids ON COMMIT DROP AS
+SELECT asset_id,
+       COALESCE(
+           substring(video_url FROM '/video/([0-9]+)'),
+           substring(video_url FROM '/v/([0-9]+)'),
+           substring(video_url FROM '[?&]item_id=([0-9]+)')
+       ) AS video_id
+FROM videos;
+
+DELETE FROM video_ids WHERE video_id IS NULL;
+
+-- 2. One merged row per video: latest stats (highest view count), earliest
+--    created_at, and the de-duplicated union of every row's history
+INSERT INTO videos (asset_id, video_url, author, views, likes, current_price, thumbnail, view_history, like_history, created_at)
+SELECT DISTINCT ON (vi.video_id)
+       vi.video_id,
+       v.video_url,
+       v.author,
+       v.views,
+       v.likes,
+       v.current_price,
+       v.thumbnail,
+       (
+           SELECT COALESCE(jsonb_agg(h.point ORDER BY h.point->>'timestamp'), '[]'::jsonb)
+           FROM (
+               SELECT DISTINCT p.point
+               FROM video_ids vi2
+               JOIN videos v2 ON v2.asset_id = vi2.asset_id,
+                    jsonb_array_elements(COALESCE(v2.view_history::jsonb, '[]'::jsonb)) AS p(point)
+               WHERE vi2.video_id = vi.video_id
+           ) h
+       ),
+       (
+           SELECT COALESCE(jsonb_agg(h.point ORDER BY h.point->>'timestamp'), '[]'::jsonb)
+           FROM (
+               SELECT DISTINCT p.point
+               FROM video_ids vi2
+               JOIN videos v2 ON v2.asset_id = vi2.asset_id,
+                    jsonb_array_elements(COALESCE(v2.like_history::jsonb, '[]'::jsonb)) AS p(point)
+               WHERE vi2.video_id = vi.video_id
+           ) h
+       ),
+       (
+           SELECT MIN(v3.created_at)
+           FROM video_ids vi3
+           JOIN videos v3 ON v3.asset_id = vi3.asset_id
+           WHERE vi3.video_id = vi.video_id
+       )
+FROM video_ids vi
+JOIN videos v ON v.asset_id = vi.asset_id
+ORDER BY vi.video_id, v.views DESC
+ON CONFLICT (asset_id) DO UPDATE SET
+    video_url = EXCLUDED.video_url,
+    author = EXCLUDED.author,
+    views = EXCLUDED.views,
+    likes = EXCLUDED.likes,
+    current_price = EXCLUDED.current_price,
+    thumbnail = EXCLUDED.thumbnail,
+    view_history = EXCLUDED.view_history,
+    like_history = EXCLUDED.like_history,
+    created_at = EXCLUDED.created_at;
+
+-- 3. Point investments at the merged rows
+UPDATE investments i
+SET asset_id = vi.video_id
+FROM video_ids vi
+WHERE i.asset_id = vi.asset_id
+  AND vi.asset_id <> vi.video_id;
+
+-- 4. Drop the old duplicate rows
+DELETE FROM videos v
+USING video_ids vi
+WHERE v.asset_id = vi.asset_id
+  AND vi.asset_id <> vi.video_id;
+
+COMMIT;
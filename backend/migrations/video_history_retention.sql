@@ -0,0 +1,123 @@
+-- Retention tiers for video_history (run create_video_history.sql first):
+-- raw points are kept for a recent window, then rolled into hourly buckets,
+-- which are later rolled into daily buckets. Each bucket keeps the min, max
+-- and last views / likes and when that last point was taken.
+-- The API calls compact_video_history() in the background
+-- (app/services/history_retention.py). Run this in your Supabase SQL Editor.
+
+CREATE TABLE IF NOT EXISTS video_history_hourly (
+    asset_id TEXT NOT NULL REFERENCES videos (asset_id) ON DELETE CASCADE,
+    bucket TIMESTAMP NOT NULL,
+    last_at TIMESTAMP NOT NULL,
+    views_min BIGINT NOT NULL,
+    views_max BIGINT NOT NULL,
+    views_last BIGINT NOT NULL,
+    likes_min BIGINT NOT NULL,
+    likes_max BIGINT NOT NULL,
+    likes_last BIGINT NOT NULL,
+    points INTEGER NOT NULL,
+    PRIMARY KEY (asset_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS video_history_daily (LIKE video_history_hourly INCLUDING ALL);
+ALTER TABLE video_history_daily
+    DROP CONSTRAINT IF EXISTS video_history_daily_asset_id_fkey,
+    ADD CONSTRAINT video_history_daily_asset_id_fkey
+        FOREIGN KEY (asset_id) REFERENCES videos (asset_id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS video_history_hourly_asset_last_idx ON video_history_hourly (asset_id, last_at);
+CREATE INDEX IF NOT EXISTS video_history_daily_asset_last_idx ON video_history_daily (asset_id, last_at);
+
+-- Moves at most batch_size rows per tier per call, each tier in one
+-- DELETE ... RETURNING / INSERT statement, so a row is never in two tiers and
+-- new points keep being appended while it runs. Returns the rows moved.
+CREATE OR REPLACE FUNCTION compact_video_history(
+    raw_window INTERVAL DEFAULT INTERVAL '7 days',
+    hourly_window INTERVAL DEFAULT INTERVAL '90 days',
+    batch_size INTEGER DEFAULT 50000
+)
+RETURNS TABLE (raw_rolled INTEGER, hourly_rolled INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    now_utc TIMESTAMP := timezone('utc', now());
+BEGIN
+    WITH moved AS (
+        DELETE FROM video_history
+        WHERE id IN (
+            SELECT id FROM video_history
+            WHERE "timestamp" < date_trunc('hour', now_utc - raw_window)
+            ORDER BY id
+            LIMIT batch_size
+        )
+        RETURNING asset_id, "timestamp", views, likes
+    ), buckets AS (
+        SELECT
+            asset_id,
+            date_trunc('hour', "timestamp") AS bucket,
+            MAX("timestamp") AS last_at,
+            MIN(views) AS views_min,
+            MAX(views) AS views_max,
+            (ARRAY_AGG(views ORDER BY "timestamp" DESC))[1] AS views_last,
+            MIN(likes) AS likes_min,
+            MAX(likes) AS likes_max,
+            (ARRAY_AGG(likes ORDER BY "timestamp" DESC))[1] AS likes_last,
+            COUNT(*)::INTEGER AS points
+        FROM moved
+        GROUP BY 1, 2
+    ), merged AS (
+        INSERT INTO video_history_hourly AS h
+        SELECT * FROM buckets
+        ON CONFLICT (asset_id, bucket) DO UPDATE SET
+            views_min = LEAST(h.views_min, EXCLUDED.views_min),
+            views_max = GREATEST(h.views_max, EXCLUDED.views_max),
+            likes_min = LEAST(h.likes_min, EXCLUDED.likes_min),
+            likes_max = GREATEST(h.likes_max, EXCLUDED.likes_max),
+            views_last = CASE WHEN EXCLUDED.last_at >= h.last_at THEN EXCLUDED.views_last ELSE h.views_last END,
+            likes_last = CASE WHEN EXCLUDED.last_at >= h.last_at THEN EXCLUDED.likes_last ELSE h.likes_last END,
+            last_at = GREATEST(h.last_at, EXCLUDED.last_at),
+            points = h.points + EXCLUDED.points
+    )
+    SELECT COUNT(*)::INTEGER FROM moved INTO raw_rolled;
+
+    WITH moved AS (
+        DELETE FROM video_history_hourly
+        WHERE (asset_id, bucket) IN (
+            SELECT asset_id, bucket FROM video_history_hourly
+            WHERE bucket < date_trunc('day', now_utc - hourly_window)
+            ORDER BY bucket
+            LIMIT batch_size
+        )
+        RETURNING *
+    ), buckets AS (
+        SELECT
+            asset_id,
+            date_trunc('day', bucket) AS bucket,
+            MAX(last_at) AS last_at,
+            MIN(views_min) AS views_min,
+            MAX(views_max) AS views_max,
+            (ARRAY_AGG(views_last ORDER BY last_at DESC))[1] AS views_last,
+            MIN(likes_min) AS likes_min,
+            MAX(likes_max) AS likes_max,
+            (ARRAY_AGG(likes_last ORDER BY last_at DESC))[1] AS likes_last,
+            SUM(points)::INTEGER AS points
+        FROM moved
+        GROUP BY 1, 2
+    ), merged AS (
+        INSERT INTO video_history_daily AS d
+        SELECT * FROM buckets
+        ON CONFLICT (asset_id, bucket) DO UPDATE SET
+            views_min = LEAST(d.views_min, EXCLUDED.views_min),
+            views_max = GREATEST(d.views_max, EXCLUDED.views_max),
+            likes_min = LEAST(d.likes_min, EXCLUDED.likes_min),
+            likes_max = GREATEST(d.likes_max, EXCLUDED.likes_max),
+            views_last = CASE WHEN EXCLUDED.last_at >= d.last_at THEN EXCLUDED.views_last ELSE d.views_last END,
+            likes_last = CASE WHEN EXCLUDED.last_at >= d.last_at THEN EXCLUDED.likes_last ELSE d.likes_last END,
+            last_at = GREATEST(d.last_at, EXCLUDED.last_at),
+            points = d.points + EXCLUDED.points
+    )
+    SELECT COUNT(*)::INTEGER FROM moved INTO hourly_rolled;
+
+    RETURN NEXT;
+END;
+$$;
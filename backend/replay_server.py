@@ -0,0 +1,156 @@
+import sys
+import os
+import re
+import json
+import base64
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+VIDEO_ID_RE = re.compile(r"/video/(\d+)")
+
+
+class Fixture:
+    """One recorded response."""
+
+    def __init__(self, body, status=200, content_type="text/html; charset=utf-8"):
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.status = status
+        self.content_type = content_type
+
+
+class ReplayServer:
+    """
+    Local HTTP server that replays recorded TikTok pages, so the scraper can
+    be exercised and benchmarked without network access.
+
+    Fixtures can be:
+      - HTML pages (e.g. dump_html.py's debug_page.html). A file named
+        <video_id>.html is served for /@<user>/video/<video_id>; any other
+        HTML file becomes the default page for every video URL.
+      - HAR recordings: every recorded response is served at its original
+        path + query.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.default_page = None
+        self.pages_by_video = {}
+        self.recorded = {}
+        self._server = None
+        self._thread = None
+
+    # ---- Loading fixtures ----
+
+    def add_page(self, html, video_id=None):
+        fixture = Fixture(html)
+        if video_id:
+            self.pages_by_video[str(video_id)] = fixture
+        else:
+            self.default_page = fixture
+
+    def add_har(self, har):
+        for entry in har.get("log", {}).get("entries", []):
+            request, response = entry["request"], entry["response"]
+            content = response.get("content", {})
+            text = content.get("text", "")
+            body = base64.b64decode(text) if content.get("encoding") == "base64" else text
+            parts = urlsplit(request["url"])
+            key = parts.path + (f"?{parts.query}" if parts.query else "")
+            self.recorded[key] = Fixture(
+                body,
+                status=response.get("status", 200),
+                content_type=content.get("mimeType", "text/html; charset=utf-8"),
+            )
+
+    def load(self, path):
+        """Load a fixture file (.html / .har) or every fixture in a directory."""
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith((".html", ".har")):
+                    self.load(os.path.join(path, name))
+            return self
+        with open(path, "r") as f:
+            content = f.read()
+        if path.endswith(".har"):
+            self.add_har(json.loads(content))
+        else:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            self.add_page(content, video_id=stem if stem.isdigit() else None)
+        return self
+
+    def lookup(self, path):
+        if path in self.recorded:
+            return self.recorded[path]
+        bare_path = path.split("?", 1)[0]
+        if bare_path in self.recorded:
+            return self.recorded[bare_path]
+        match = VIDEO_ID_RE.search(bare_path)
+        if match:
+            return self.pages_by_video.get(match.group(1), self.default_page)
+        return None
+
+    # ---- Serving ----
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def video_url(self, video_id, author="replay"):
+        return f"{self.base_url}/@{author}/video/{video_id}"
+
+    def start(self):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                fixture = replay.lookup(self.path)
+                if fixture is None:
+                    fixture = Fixture("Not recorded", status=404, content_type="text/plain")
+                self.send_response(fixture.status)
+                self.send_header("Content-Type", fixture.content_type)
+                self.send_header("Content-Length", str(len(fixture.body)))
+                self.end_headers()
+                self.wfile.write(fixture.body)
+
+            def do_HEAD(self):
+                fixture = replay.lookup(self.path)
+                self.send_response(fixture.status if fixture else 404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # python replay_server.py [fixture file or dir] [port]
+    fixture_path = sys.argv[1] if len(sys.argv) > 1 else "debug_page.html"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    server = ReplayServer(port=port).load(fixture_path).start()
+    print(f"Replaying {fixture_path} at {server.video_url('6862153058223193350')}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()